@@ -0,0 +1,32 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0011_rename_active_tip_is_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TipBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('devices', models.IntegerField(default=0)),
+                ('batches', models.IntegerField(default=0)),
+                ('batches_done', models.IntegerField(default=0)),
+                ('delivered', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('pruned', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dispatched_at', models.DateTimeField(null=True)),
+                ('tip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcasts', to='adminpanel.tip')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -42,4 +42,24 @@ class Tip(models.Model):
     is_active = models.BooleanField(default=False)
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+
+class TipBroadcast(models.Model):
+    """Push fan-out of a tip, filled in by adminpanel.tasks as batches finish."""
+    tip = models.ForeignKey(Tip, on_delete=models.CASCADE, related_name="broadcasts")
+    devices = models.IntegerField(default=0)
+    batches = models.IntegerField(default=0)
+    batches_done = models.IntegerField(default=0)
+    delivered = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    pruned = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def done(self):
+        return self.dispatched_at is not None and self.batches_done >= self.batches
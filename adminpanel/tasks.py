@@ -0,0 +1,97 @@
+import requests
+from celery import shared_task
+from core.models import UserSetting
+from core.tasks import PUSH_MAX_RETRIES, prune_device_tokens
+from core.utils import (
+    FCM_MULTICAST_LIMIT,
+    invalid_registration_ids,
+    send_multicast_notification,
+)
+from django.db.models import F
+from django.utils import timezone
+from pyfcm.errors import FCMError, FCMServerError
+
+from adminpanel.models import TipBroadcast
+
+
+def tip_message(tip_text):
+    body = "Fun Fact!"
+    title = f"Hey there! We have a fun fact for you. Check out now. ... {tip_text[:100]}"
+    return title, body
+
+
+@shared_task
+def broadcast_tip(broadcast_id):
+    """
+    Stream every device token and queue one send_tip_batch per FCM multicast
+    batch, so the batches go out in parallel across workers.
+    """
+    broadcast = TipBroadcast.objects.select_related("tip").get(id=broadcast_id)
+    title, body = tip_message(broadcast.tip.text)
+
+    tokens = (
+        UserSetting.objects.exclude(device_token__isnull=True)
+        .exclude(device_token="")
+        .order_by()
+        .values_list("device_token", flat=True)
+        .iterator(chunk_size=FCM_MULTICAST_LIMIT)
+    )
+    devices = batches = 0
+    batch = []
+    for token in tokens:
+        batch.append(token)
+        if len(batch) == FCM_MULTICAST_LIMIT:
+            send_tip_batch.delay(broadcast_id, batch, title, body)
+            devices += len(batch)
+            batches += 1
+            batch = []
+    if batch:
+        send_tip_batch.delay(broadcast_id, batch, title, body)
+        devices += len(batch)
+        batches += 1
+
+    TipBroadcast.objects.filter(id=broadcast_id).update(
+        devices=devices, batches=batches, dispatched_at=timezone.now()
+    )
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(FCMServerError, requests.RequestException),
+    retry_backoff=True,
+    retry_backoff_max=10 * 60,
+    retry_jitter=True,
+    max_retries=PUSH_MAX_RETRIES,
+)
+def send_tip_batch(self, broadcast_id, registration_ids, title, body):
+    """
+    Multicast one batch, prune tokens FCM rejects and add to the broadcast counts.
+    Retried like send_push_batch while FCM is unavailable; the last attempt
+    counts the batch as failed so the broadcast still completes.
+    """
+    delivered, failed, pruned = 0, len(registration_ids), 0
+    try:
+        response = send_multicast_notification(
+            registration_ids, title, body, notification_type="Tip"
+        )
+    except (FCMServerError, requests.RequestException) as e:
+        if self.request.retries < self.max_retries:
+            raise
+        print(
+            f"Tip batch of {len(registration_ids)} devices failed after "
+            f"{self.request.retries} retries: {e}"
+        )
+    except FCMError as e:
+        print(f"Tip batch of {len(registration_ids)} devices failed: {e}")
+    else:
+        delivered, failed = response["success"], response["failure"]
+        invalid = invalid_registration_ids(registration_ids, response)
+        if invalid:
+            pruned = prune_device_tokens(invalid)
+
+    TipBroadcast.objects.filter(id=broadcast_id).update(
+        batches_done=F("batches_done") + 1,
+        delivered=F("delivered") + delivered,
+        failed=F("failed") + failed,
+        pruned=F("pruned") + pruned,
+    )
@@ -1,23 +1,9 @@
+from adminpanel.models import Tip, TipBroadcast
+from adminpanel.tasks import broadcast_tip
 
-from core.models import Notification, UserSetting
-from core.utils import send_notification
 
-
-def send_tip_notification(tip_text):
-    body = "Fun Fact!"
-    title = f"Hey there! We have a fun fact for you. Check out now. ... {tip_text[:100]}"
-
-    user_settings = UserSetting.objects.all()
-    for setting in user_settings:
-        registration_id = setting.device_token
-
-        # Notification.objects.create(
-        #         user=setting.user, notification_type=notification_type, head=head, body=body
-        #     )
-        if registration_id:
-            send_notification(
-                registration_id=registration_id,
-                message_title=title,
-                message_body=body,
-                notification_type="Tip"
-            )
+def send_tip_notification(tip: Tip):
+    """Start a background push of the tip to every device; progress is kept on the returned TipBroadcast."""
+    broadcast = TipBroadcast.objects.create(tip=tip)
+    broadcast_tip.delay(broadcast.id)
+    return broadcast
@@ -34,6 +34,9 @@ from adminpanel.models import (
     Tip,
 )
 from adminpanel.utils import send_tip_notification
+from api.authentication import forget_tokens, invalidate_auth_cache, user_token_keys
+from core.cache import bump_symbol_map, invalidate_quote_cache
+from core.utils import upsert_market_quotes
 
 
 # Create your views here.
@@ -149,6 +152,7 @@ class PasswordResetView(View):
         if password == password2:
             user.set_password(password)
             user.save()
+            invalidate_auth_cache(user.id)
             messages.add_message(request, messages.SUCCESS, "Password reset complete!")
             password_reset_obj.delete()
         else:
@@ -284,11 +288,15 @@ class CustomerManagementView(LoginRequiredMixin, ListView):
                 if todo == "block":
                     user.is_active = False
                     user.save()
+                    invalidate_auth_cache(user.id)
                 elif todo == "unblock":
                     user.is_active = True
                     user.save()
+                    invalidate_auth_cache(user.id)
                 elif todo == "delete":
+                    token_keys = user_token_keys(user.id)
                     user.delete()
+                    forget_tokens(token_keys)
 
             except User.DoesNotExist:
                 return JsonResponse({"message": "Failed to find user"})
@@ -423,6 +431,7 @@ class CustomerEditView(DetailView):
         try:
             profile.save()
             user.save()
+            invalidate_auth_cache(user.id)
             messages.add_message(
                 request, messages.SUCCESS, "Details updated successfully!"
             )
@@ -554,32 +563,30 @@ class StockUploadView(LoginRequiredMixin, View):
 
         Stock.objects.all().delete()
         df = df.fillna("")
-        [Stock.objects.create(**x) for x in df.T.to_dict().values()]
-
-        stocks = Stock.objects.all()
+        stocks = Stock.objects.bulk_create(
+            [Stock(**x) for x in df.T.to_dict().values()]
+        )
 
-        for stock in stocks:
-            try:
-                market_quote: MarketQuote = MarketQuote.objects.get(
-                    trading_symbol=stock.symbol
-                )
-                market_quote.extra_text = stock.extra_text
-                market_quote.save()
-            except MarketQuote.DoesNotExist:
-                MarketQuote.objects.create(
-                    company_name=stock.company_name,
-                    trading_symbol=stock.symbol,
-                    exchange="NSE",
-                    price=0.0,
-                    extra_text=stock.extra_text,
-                )
+        upsert_market_quotes(
+            {
+                ("NSE", stock.symbol): {"extra_text": stock.extra_text}
+                for stock in stocks
+            },
+            create_data={
+                ("NSE", stock.symbol): {
+                    "company_name": stock.company_name,
+                    "price": 0.0,
+                }
+                for stock in stocks
+            },
+        )
 
         # Delete leftover stocks
-        new_symbols = [stock.symbol for stock in stocks]
-        market_quotes = MarketQuote.objects.all()
-        for quote in market_quotes:
-            if quote.trading_symbol not in new_symbols:
-                quote.delete()
+        MarketQuote.objects.exclude(
+            trading_symbol__in=[stock.symbol for stock in stocks]
+        ).delete()
+        invalidate_quote_cache()
+        bump_symbol_map()
 
         messages.add_message(
             request, messages.SUCCESS, "Stock-list uploaded successfully!"
@@ -615,9 +622,8 @@ class StockEditView(LoginRequiredMixin, DetailView):
         stock.extra_text = extra_text
         stock.save()
 
-        quote: MarketQuote = MarketQuote.objects.get(trading_symbol=stock.symbol)
-        quote.extra_text = extra_text
-        quote.save()
+        # Uploaded stocks are listed on NSE.
+        upsert_market_quotes({("NSE", stock.symbol): {"extra_text": extra_text}})
 
         return redirect("adminpanel:stock-management")
 
@@ -752,9 +758,9 @@ class TipManagementView(LoginRequiredMixin, ListView):
         q = self.request.GET.get("q", None)
         if q:
             q = q.strip()
-            return Tip.objects.filter(Q(text__icontains=q))
+            return Tip.objects.filter(Q(text__icontains=q)).prefetch_related("broadcasts")
         else:
-            return Tip.objects.all()
+            return Tip.objects.all().prefetch_related("broadcasts")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -781,7 +787,7 @@ class TipManagementView(LoginRequiredMixin, ListView):
                     Tip.objects.all().update(is_active=False)
                     tip.is_active = True
                     tip.save()
-                    send_tip_notification(tip.text)
+                    send_tip_notification(tip)
             except Tip.DoesNotExist:
                 return JsonResponse({"message": "Failed to find tip"})
 
@@ -818,6 +824,6 @@ class TipAddView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         tip_text = request.POST.get("tip_text", None)
         Tip.objects.all().update(is_active=False)
-        Tip.objects.create(text=tip_text, is_active=True)
-        send_tip_notification(tip_text)
+        tip = Tip.objects.create(text=tip_text, is_active=True)
+        send_tip_notification(tip)
         return redirect("adminpanel:tip-management")
@@ -0,0 +1,193 @@
+"""
+Token authentication with the token -> user lookup cached.
+
+Resolved tokens are kept, with the user's profile, settings and subscription
+preloaded, in a small in-process LRU for AUTH_CACHE_LOCAL_TTL seconds and in
+Redis for AUTH_CACHE_TTL seconds, as JSON of the rows' column values. Anything that changes a token, the user or
+those related rows must call invalidate_auth_cache()/forget_tokens(); the
+in-process copy in other workers then lapses within AUTH_CACHE_LOCAL_TTL.
+"""
+import datetime
+import decimal
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import redis
+from core.cache import get_redis_connection
+from core.models import User
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.fields.files import FieldFile
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+AUTH_CACHE_TTL = settings.AUTH_CACHE_TTL
+AUTH_CACHE_LOCAL_TTL = settings.AUTH_CACHE_LOCAL_TTL
+AUTH_CACHE_LOCAL_SIZE = settings.AUTH_CACHE_LOCAL_SIZE
+
+
+class LocalTTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+_local_cache = LocalTTLCache(AUTH_CACHE_LOCAL_SIZE, AUTH_CACHE_LOCAL_TTL)
+
+
+def _cache_key(key):
+    # Don't keep raw tokens in Redis key names.
+    return "auth:token:json:" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def forget_tokens(keys):
+    keys = list(keys)
+    if not keys:
+        return
+    for key in keys:
+        _local_cache.pop(key)
+    try:
+        get_redis_connection().delete(*[_cache_key(key) for key in keys])
+    except redis.RedisError as e:
+        print(f"Failed to invalidate auth cache: {e}")
+
+
+def user_token_keys(*user_ids):
+    return list(Token.objects.filter(user_id__in=user_ids).values_list("key", flat=True))
+
+
+def invalidate_auth_cache(*user_ids):
+    """Drop cached auth for these users after their user/profile/settings/subscription changed."""
+    forget_tokens(user_token_keys(*user_ids))
+
+
+# Reverse one-to-ones cached along with the user.
+USER_RELATIONS = ("profile", "settings", "subscription")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, FieldFile):
+        return value.name
+    raise TypeError(f"Can't cache {type(value).__name__} in the auth cache")
+
+
+def _dump_row(instance):
+    return {
+        field.attname: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+    }
+
+
+def _load_row(model, row):
+    fields = model._meta.concrete_fields
+    return model.from_db(
+        DEFAULT_DB_ALIAS,
+        [field.attname for field in fields],
+        [field.to_python(row[field.attname]) for field in fields],
+    )
+
+
+def serialize_token(token):
+    """JSON for a Token loaded with select_related user and USER_RELATIONS."""
+    user = token.user
+    data = {"token": _dump_row(token), "user": _dump_row(user)}
+    for name in USER_RELATIONS:
+        related = getattr(user, name, None)
+        data[name] = _dump_row(related) if related is not None else None
+    return json.dumps(data, default=_json_default).encode("utf-8")
+
+
+def deserialize_token(cached):
+    """Rebuild the Token, its user and USER_RELATIONS from serialize_token() JSON."""
+    data = json.loads(cached)
+    token = _load_row(Token, data["token"])
+    user = _load_row(User, data["user"])
+    token.user = user
+    for name in USER_RELATIONS:
+        relation = User._meta.get_field(name)
+        if data[name] is None:
+            # Cache the miss too, so user.<name> raises DoesNotExist without a query.
+            relation.set_cached_value(user, None)
+        else:
+            setattr(user, name, _load_row(relation.related_model, data[name]))
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def get_token(self, key):
+        # Entries are rebuilt per request so every request gets its own User instance.
+        cached = _local_cache.get(key)
+        if cached is None:
+            cached = self.load_token(key)
+            if cached is None:
+                return None
+            _local_cache.set(key, cached)
+        return deserialize_token(cached)
+
+    def load_token(self, key):
+        cache_key = _cache_key(key)
+        try:
+            cached = get_redis_connection().get(cache_key)
+        except redis.RedisError as e:
+            print(f"Failed to read auth cache: {e}")
+            cached = None
+        if cached is not None:
+            return cached
+
+        try:
+            token = Token.objects.select_related(
+                "user", *[f"user__{name}" for name in USER_RELATIONS]
+            ).get(key=key)
+        except Token.DoesNotExist:
+            return None
+        cached = serialize_token(token)
+        try:
+            get_redis_connection().set(cache_key, cached, ex=AUTH_CACHE_TTL)
+        except redis.RedisError as e:
+            print(f"Failed to write auth cache: {e}")
+        return cached
+
+    def authenticate_credentials(self, key):
+        token = self.get_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        return (token.user, token)
@@ -1,12 +1,16 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from api.utils import check_kyc_status
+from api.utils import KiteBusyException, check_kyc_status
 
 class ZerodhaView(APIView):
     
     def dispatch(self, request, *args , **kwargs ):
-        if not check_kyc_status(request.user):
+        try:
+            kyc_done = check_kyc_status(request.user)
+        except KiteBusyException as e:
+            return Response(e.detail, status=e.status_code)
+        if not kyc_done:
             return Response(
                 {
                     "errors": "KYC NOT DONE OR EXPIRED",
@@ -4,6 +4,7 @@ from rest_framework import mixins, status, viewsets
 from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from .authentication import invalidate_auth_cache
 from .custom_mixins import OnlyPOSTUpdateModelMixin
 from core.models import User
 from .utils import NoDataException, StandardResultsSetPagination
@@ -28,8 +29,14 @@ class GetPostViewSet(
     def get_object(self):
         return self.get_queryset()
 
+    def perform_create(self, serializer):
+        serializer.save()
+        # The user's profile/settings are cached with their auth token.
+        invalidate_auth_cache(self.request.user.id)
+
     def perform_update(self, serializer):
         serializer.save()
+        invalidate_auth_cache(self.request.user.id)
 
     def list(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -81,7 +88,8 @@ class GetPostUsingIdViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
         serializer.is_valid(raise_exception=True)
         profile_photo = self.perform_create(serializer)
         profile.profile_photo = profile_photo
-        profile.save()
+        profile.save(update_fields=["profile_photo"])
+        invalidate_auth_cache(user.id)
 
         headers = self.get_success_headers(serializer.data)
         return Response(
@@ -0,0 +1,276 @@
+"""
+Shared HTTP client for the Kite Connect API.
+
+Every Kite call goes through one pooled, keep-alive session with default
+timeouts and retry/backoff on 429/5xx. Credentials are passed per call and
+never stored on the shared session, so it is safe to use from concurrent
+requests and worker threads. Latency and error counters are kept per
+endpoint for the current process, see get_stats(). Calls are throttled per
+endpoint class by the shared Redis token bucket in api.ratelimit.
+
+The async_* functions are the same client on httpx for the async views.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from kiteconnect import KiteConnect
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from api import ratelimit
+
+KITE_CREDS = settings.KITE_CREDS
+KITE_API_ROOT = settings.KITE_API_ROOT
+KITE_POOL_SIZE = settings.KITE_POOL_SIZE
+KITE_ASYNC_POOL_SIZE = settings.KITE_ASYNC_POOL_SIZE
+KITE_REQUEST_RETRIES = settings.KITE_REQUEST_RETRIES
+KITE_REQUEST_TIMEOUT = settings.KITE_REQUEST_TIMEOUT
+KITE_RATE_LIMITS = settings.KITE_RATE_LIMITS
+KITE_RATE_LIMIT_MAX_WAIT = settings.KITE_RATE_LIMIT_MAX_WAIT
+
+_session = None
+_session_lock = threading.Lock()
+
+_async_clients = weakref.WeakKeyDictionary()
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_stats = defaultdict(
+    lambda: {"calls": 0, "errors": 0, "total_time": 0.0, "max_time": 0.0}
+)
+_stats_lock = threading.Lock()
+
+
+def _endpoint_name(method, url):
+    # Collapse ids (order ids, instrument tokens) so counters stay bounded.
+    segments = [
+        "{id}" if any(c.isdigit() for c in segment) else segment
+        for segment in urlparse(url).path.split("/")
+    ]
+    return f"{method.upper()} {'/'.join(segments) or '/'}"
+
+
+def _rate_limit_class(method, url):
+    path = urlparse(url).path
+    if path.startswith("/quote"):
+        return "quote"
+    if path.startswith("/instruments/historical"):
+        return "historical"
+    if path.startswith("/orders") and method.upper() != "GET":
+        return "orders"
+    return "default"
+
+
+def _record(endpoint, elapsed, failed):
+    with _stats_lock:
+        stats = _stats[endpoint]
+        stats["calls"] += 1
+        stats["errors"] += int(failed)
+        stats["total_time"] += elapsed
+        stats["max_time"] = max(stats["max_time"], elapsed)
+
+
+def get_stats():
+    """Per-endpoint call/error counts and latency (seconds) for this process."""
+    with _stats_lock:
+        return {
+            endpoint: {
+                **stats,
+                "avg_time": stats["total_time"] / stats["calls"] if stats["calls"] else 0.0,
+            }
+            for endpoint, stats in _stats.items()
+        }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class InstrumentedSession(requests.Session):
+    def request(self, method, url, *args, rate_limit_wait=None, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = KITE_REQUEST_TIMEOUT
+        limit_class = _rate_limit_class(method, url)
+        ratelimit.acquire(
+            f"kite:{limit_class}",
+            KITE_RATE_LIMITS[limit_class],
+            max_wait=(
+                KITE_RATE_LIMIT_MAX_WAIT if rate_limit_wait is None else rate_limit_wait
+            ),
+        )
+        endpoint = _endpoint_name(method, url)
+        failed = True
+        start = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            _record(endpoint, time.monotonic() - start, failed)
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=KITE_REQUEST_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=RETRY_STATUSES,
+                    # Token exchange/refresh POSTs must never be replayed.
+                    allowed_methods=["GET"],
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=KITE_POOL_SIZE, max_retries=retry
+                )
+                session = InstrumentedSession()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def auth_headers(access_token, api_key=None):
+    return {
+        "X-Kite-Version": "3",
+        "Authorization": f"token {api_key or KITE_CREDS['api_key']}:{access_token}",
+    }
+
+
+def get(path, access_token, api_key=None, **kwargs):
+    return get_session().get(
+        KITE_API_ROOT + path, headers=auth_headers(access_token, api_key), **kwargs
+    )
+
+
+def get_margins(access_token, api_key=None):
+    return get("/user/margins", access_token, api_key)
+
+
+def get_quotes(instruments, access_token, api_key=None, rate_limit_wait=None):
+    params = [("i", instrument) for instrument in instruments]
+    return get(
+        "/quote", access_token, api_key, params=params, rate_limit_wait=rate_limit_wait
+    )
+
+
+def _checksum(token):
+    api_key = KITE_CREDS["api_key"]
+    return hashlib.sha256(
+        api_key.encode("utf-8") + token.encode("utf-8") + KITE_CREDS["secret"].encode("utf-8")
+    ).hexdigest()
+
+
+def refresh_session(refresh_token):
+    return get_session().post(
+        KITE_API_ROOT + "/session/refresh_token",
+        data={
+            "api_key": KITE_CREDS["api_key"],
+            "refresh_token": refresh_token,
+            "checksum": _checksum(refresh_token),
+        },
+    )
+
+
+def get_kite_connect(access_token=None):
+    """
+    A KiteConnect bound to one user's access token, sharing the pooled session.
+    Build one per request instead of calling set_access_token on a shared object.
+    """
+    kite = KiteConnect(
+        api_key=KITE_CREDS["api_key"],
+        access_token=access_token,
+        root=KITE_API_ROOT,
+        timeout=KITE_REQUEST_TIMEOUT,
+    )
+    kite.reqsession = get_session()
+    return kite
+
+
+def get_async_client():
+    """One pooled httpx.AsyncClient per event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=KITE_REQUEST_TIMEOUT,
+            transport=httpx.AsyncHTTPTransport(
+                retries=KITE_REQUEST_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=KITE_ASYNC_POOL_SIZE,
+                    max_keepalive_connections=KITE_ASYNC_POOL_SIZE,
+                ),
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def async_request(method, path, access_token=None, api_key=None, rate_limit_wait=None, **kwargs):
+    url = KITE_API_ROOT + path
+    limit_class = _rate_limit_class(method, url)
+    wait = await sync_to_async(ratelimit.reserve, thread_sensitive=False)(
+        f"kite:{limit_class}",
+        KITE_RATE_LIMITS[limit_class],
+        max_wait=KITE_RATE_LIMIT_MAX_WAIT if rate_limit_wait is None else rate_limit_wait,
+    )
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+    if access_token is not None:
+        kwargs["headers"] = auth_headers(access_token, api_key)
+    # Same policy as the sync session: only GETs are retried on 429/5xx.
+    retries = KITE_REQUEST_RETRIES if method.upper() == "GET" else 0
+    client = get_async_client()
+    endpoint = _endpoint_name(method, url)
+    failed = True
+    start = time.monotonic()
+    try:
+        for attempt in range(retries + 1):
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                break
+            await asyncio.sleep(0.5 * 2**attempt)
+        failed = response.status_code >= 400
+        return response
+    finally:
+        _record(endpoint, time.monotonic() - start, failed)
+
+
+async def async_get_margins(access_token, api_key=None):
+    return await async_request("GET", "/user/margins", access_token, api_key)
+
+
+async def async_generate_session(request_token):
+    """
+    Exchange a login request_token like KiteConnect.generate_session. Returns
+    the session data, or None if Kite rejected the token.
+    """
+    resp = await async_request(
+        "POST",
+        "/session/token",
+        data={
+            "api_key": KITE_CREDS["api_key"],
+            "request_token": request_token,
+            "checksum": _checksum(request_token),
+        },
+    )
+    if resp.status_code != 200:
+        return None
+    data = resp.json()["data"]
+    if data.get("login_time") and len(data["login_time"]) == 19:
+        data["login_time"] = parse_datetime(data["login_time"])
+    return data
@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+
+from core.cache import PriceBandIndex, get_all_cached_quotes, get_price_index
+from core.models import MarketQuote
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.serializers import MarketQuoteSerializer
+
+FIELDS = MarketQuoteSerializer.Meta.fields
+
+
+def orm_band(price, keyword):
+    """The market filter as a Postgres query, as it was before the quote cache."""
+    query = MarketQuote.objects.filter(price__gt=0, price__gte=price - 10, price__lte=price)
+    if keyword:
+        query = query.filter(
+            Q(company_name__icontains=keyword) | Q(trading_symbol__icontains=keyword)
+        )
+    return list(query.order_by("trading_symbol").values(*FIELDS))
+
+
+def scan_band(price, keyword):
+    """Linear scan over the Redis quote hash (the previous cache path)."""
+    quotes = [
+        x
+        for x in get_all_cached_quotes().values()
+        if x["price"] > 0 and price - 10 <= x["price"] <= price
+    ]
+    if keyword:
+        keyword = keyword.lower()
+        quotes = [
+            x
+            for x in quotes
+            if keyword in (x["company_name"] or "").lower()
+            or keyword in x["trading_symbol"].lower()
+        ]
+    return sorted(quotes, key=lambda x: x["trading_symbol"])
+
+
+def index_band(price, keyword):
+    return get_price_index().band(price - 10, price, keyword)
+
+
+def timed(func, cases):
+    latencies, results = [], []
+    for price, keyword in cases:
+        start = time.perf_counter()
+        results.append(func(price, keyword))
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies), results
+
+
+class Command(BaseCommand):
+    help = (
+        "Time MarketFilterViewSet lookups through the in-process price-band "
+        "index against the ORM query and the Redis quote scan, and check that "
+        "they return the same quotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=1000)
+        parser.add_argument("--max-price", type=float, default=5000)
+        parser.add_argument(
+            "--keywords",
+            nargs="*",
+            default=["", "", "a", "bank", "in"],
+            help="Keywords picked at random per lookup ('' for none)",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        cases = [
+            (round(rng.uniform(10, options["max_price"]), 2), rng.choice(options["keywords"]))
+            for _ in range(options["iterations"])
+        ]
+
+        start = time.perf_counter()
+        price_index = PriceBandIndex(0, get_all_cached_quotes().values())
+        print(
+            f"Fetched and indexed {len(price_index.quotes)} quotes in "
+            f"{(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        get_price_index()
+
+        results = {}
+        for name, func in (("orm", orm_band), ("redis scan", scan_band), ("index", index_band)):
+            latencies, results[name] = timed(func, cases)
+            print(
+                f"{name:>10}: mean {statistics.mean(latencies) * 1000:.3f}ms, "
+                f"p50 {statistics.median(latencies) * 1000:.3f}ms, "
+                f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.3f}ms"
+            )
+
+        symbols = {
+            name: [[x["trading_symbol"] for x in quotes] for quotes in result]
+            for name, result in results.items()
+        }
+        mismatches = sum(a != b for a, b in zip(symbols["orm"], symbols["index"]))
+        print(f"{mismatches} of {len(cases)} lookups differ between orm and index")
@@ -0,0 +1,93 @@
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class FakeKiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, code=200):
+        body = json.dumps({"status": "success", "data": data}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def session(self):
+        return {
+            "user_id": "AB1234",
+            "user_type": "individual",
+            "email": "test@example.com",
+            "user_name": "Test User",
+            "user_shortname": "Test",
+            "broker": "ZERODHA",
+            "exchanges": ["NSE", "BSE"],
+            "products": ["CNC", "MIS"],
+            "order_types": ["MARKET", "LIMIT"],
+            "api_key": "test",
+            "access_token": uuid.uuid4().hex,
+            "refresh_token": uuid.uuid4().hex,
+            "public_token": uuid.uuid4().hex,
+            "login_time": timezone.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        if url.path == "/user/margins":
+            self.send_json({"equity": {"net": round(random.uniform(1000, 100000), 2)}})
+        elif url.path == "/quote":
+            data = {}
+            for instrument in parse_qs(url.query).get("i", []):
+                close = random.uniform(10, 5000)
+                data[instrument] = {
+                    "instrument_token": random.randint(1, 10**7),
+                    "last_price": round(close * random.uniform(0.98, 1.02), 2),
+                    "ohlc": {"close": round(close, 2)},
+                }
+            self.send_json(data)
+        else:
+            self.send_json({}, code=404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        if self.path in ("/session/token", "/session/refresh_token"):
+            self.send_json(self.session())
+        else:
+            self.send_json({}, code=404)
+
+
+class FakeKiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Don't let the listen backlog be the bottleneck under load.
+    request_queue_size = 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local HTTP server that mimics the Kite REST endpoints we call, "
+        "for load testing. Point KITE_API_ROOT at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=9100)
+        parser.add_argument(
+            "--latency", type=float, default=0.2, help="Seconds to hold every response"
+        )
+
+    def handle(self, *args, **options):
+        server = FakeKiteServer(("127.0.0.1", options["port"]), FakeKiteHandler)
+        server.latency = options["latency"]
+        print(f"Fake Kite API listening on http://127.0.0.1:{options['port']}")
+        server.serve_forever()
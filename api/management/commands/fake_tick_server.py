@@ -0,0 +1,79 @@
+import json
+import random
+import struct
+
+from autobahn.twisted.websocket import WebSocketServerFactory, WebSocketServerProtocol
+from django.core.management.base import BaseCommand
+from twisted.internet import reactor, task
+
+# Frames are sent this many times a second, each carrying rate / FRAMES_PER_SECOND ticks.
+FRAMES_PER_SECOND = 20
+
+
+class FakeTickerProtocol(WebSocketServerProtocol):
+    def onOpen(self):
+        self.tokens = []
+        self.factory.clients.add(self)
+
+    def onMessage(self, payload, is_binary):
+        if is_binary:
+            return
+        message = json.loads(payload)
+        if message.get("a") == "subscribe":
+            self.tokens.extend(x for x in message["v"] if x not in self.tokens)
+        elif message.get("a") == "unsubscribe":
+            self.tokens = [x for x in self.tokens if x not in message["v"]]
+
+    def onClose(self, was_clean, code, reason):
+        self.factory.clients.discard(self)
+
+
+class FakeTickerFactory(WebSocketServerFactory):
+    protocol = FakeTickerProtocol
+
+    def __init__(self, url, ticks_per_frame):
+        super().__init__(url)
+        self.clients = set()
+        self.ticks_per_frame = ticks_per_frame
+        self.prices = {}
+        self.sent = 0
+
+    def quote_packet(self, token):
+        # Quote mode packet (44 bytes), prices in paise.
+        close = self.prices.setdefault(token, random.randint(1000, 500000))
+        price = max(1, int(close * random.uniform(0.98, 1.02)))
+        return struct.pack(
+            ">11I", token, price, 1, price, 1000, 500, 500, close, price, price, close
+        )
+
+    def broadcast(self):
+        for client in list(self.clients):
+            if not client.tokens:
+                continue
+            tokens = random.choices(client.tokens, k=self.ticks_per_frame)
+            frame = struct.pack(">H", len(tokens)) + b"".join(
+                struct.pack(">H", 44) + self.quote_packet(token) for token in tokens
+            )
+            client.sendMessage(frame, isBinary=True)
+            self.sent += len(tokens)
+
+    def report(self):
+        print(f"{self.sent} ticks/s to {len(self.clients)} clients")
+        self.sent = 0
+
+
+class Command(BaseCommand):
+    help = "Run a local websocket server that mimics the Kite ticker for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=9000)
+        parser.add_argument("--rate", type=int, default=5000, help="Ticks per second")
+
+    def handle(self, *args, **options):
+        ticks_per_frame = max(1, options["rate"] // FRAMES_PER_SECOND)
+        factory = FakeTickerFactory(f"ws://127.0.0.1:{options['port']}", ticks_per_frame)
+        task.LoopingCall(factory.broadcast).start(1 / FRAMES_PER_SECOND)
+        task.LoopingCall(factory.report).start(1, now=False)
+        reactor.listenTCP(options["port"], factory)
+        print(f"Fake ticker listening on ws://127.0.0.1:{options['port']}")
+        reactor.run()
@@ -0,0 +1,64 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+async def worker(client, url, headers, remaining, latencies, errors):
+    while remaining:
+        remaining.pop()
+        start = time.monotonic()
+        try:
+            resp = await client.get(url, headers=headers)
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.monotonic() - start)
+
+
+async def run(url, token, requests, concurrency):
+    headers = {"Authorization": f"Token {token}"} if token else {}
+    remaining = list(range(requests))
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        start = time.monotonic()
+        await asyncio.gather(
+            *(
+                worker(client, url, headers, remaining, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+        elapsed = time.monotonic() - start
+    return elapsed, sorted(latencies), errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GETs at a Zerodha endpoint (e.g. check-status) and report "
+        "throughput and latency. Use with fake_kite_server to compare the sync "
+        "and async (ZERODHA_ASYNC_VIEWS) views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url")
+        parser.add_argument("--token", help="DRF auth token of a user with Zerodha linked")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=100)
+
+    def handle(self, *args, **options):
+        elapsed, latencies, errors = asyncio.run(
+            run(options["url"], options["token"], options["requests"], options["concurrency"])
+        )
+        if not latencies:
+            return
+        print(f"{len(latencies)} requests in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} req/s)")
+        print(
+            f"latency p50 {statistics.median(latencies) * 1000:.0f}ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms, "
+            f"max {latencies[-1] * 1000:.0f}ms"
+        )
+        print(f"{len(errors)} errors {sorted(set(map(str, errors)))}")
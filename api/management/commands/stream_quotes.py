@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.streaming import QuoteStreamer
+
+
+class Command(BaseCommand):
+    help = "Stream Kite ticks for all MarketQuotes and flush the latest prices periodically"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=None, help="Flush interval in seconds"
+        )
+        parser.add_argument(
+            "--root", default=None, help="Ticker websocket root, e.g. ws://127.0.0.1:9000"
+        )
+        parser.add_argument("--api-key", default=None)
+        parser.add_argument("--access-token", default=None)
+
+    def handle(self, *args, **options):
+        streamer = QuoteStreamer(flush_interval=options["interval"], root=options["root"])
+        streamer.run(api_key=options["api_key"], access_token=options["access_token"])
@@ -0,0 +1,181 @@
+"""
+Zerodha order postbacks. PostBackView only queues the raw payload as a
+PostBack row; process_postback_batch applies them from a Celery task.
+
+Zerodha sends several postbacks per order and repeats them on retry. Each
+(order_id, status, exchange_timestamp) is claimed in Redis first, so replays
+are dropped without touching the database; the PostBack unique constraint
+catches whatever gets past Redis.
+"""
+import redis
+from adminpanel.models import AdminNotification
+from core.cache import get_redis_connection
+from core.lots import apply_fill
+from core.models import Notification, PostBack, Transaction, UserSetting
+from core.notifications import NotificationBuffer
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+POSTBACK_DEDUPE_TTL = settings.POSTBACK_DEDUPE_TTL
+POSTBACK_MAX_ATTEMPTS = settings.POSTBACK_MAX_ATTEMPTS
+POSTBACK_RETRY_DELAY = settings.POSTBACK_RETRY_DELAY
+
+
+def _postback_key(data):
+    return "postback:{}:{}:{}".format(
+        data.get("order_id") or "",
+        data.get("status") or "",
+        data.get("exchange_timestamp") or "",
+    )
+
+
+def enqueue_postback(data):
+    """Store a postback once. Returns False for a replay."""
+    key = _postback_key(data)
+    try:
+        if not get_redis_connection().set(key, 1, nx=True, ex=POSTBACK_DEDUPE_TTL):
+            return False
+    except redis.RedisError as e:
+        print(f"Postback dedupe unavailable, relying on the database: {e}")
+
+    try:
+        _, created = PostBack.objects.get_or_create(
+            order_id=data.get("order_id") or "",
+            status=data.get("status") or "",
+            exchange_timestamp=data.get("exchange_timestamp") or "",
+            defaults={"payload": data},
+        )
+    except Exception:
+        # Not stored, so let Zerodha's retry through.
+        try:
+            get_redis_connection().delete(key)
+        except redis.RedisError:
+            pass
+        raise
+    return created
+
+
+def apply_postback(data):
+    """
+    Apply one postback to its Transaction, locking the row. Returns
+    (admin_notification, notification, registration_id, dedupe_key) for a newly
+    completed order, unsaved, or None.
+    """
+    tag = data.get("tag", None)
+    if not tag:
+        return None
+    try:
+        transaction_obj: Transaction = (
+            Transaction.objects.select_for_update(of=("self",))
+            .select_related("user")
+            .get(id=int(tag))
+        )
+    except Transaction.DoesNotExist:
+        return None
+
+    if data.get("status", None) == "COMPLETE":
+        status = "Completed"
+    else:
+        status = (data.get("status") or "Cancelled").title()
+    if not transaction_obj.accepts_status(status, data.get("exchange_timestamp")):
+        # Late or out of order delivery; never regress the order.
+        return None
+
+    if status != "Completed":
+        transaction_obj.status = status
+        transaction_obj.zerodha_postback = data
+        transaction_obj.save()
+        return None
+
+    transaction_obj.price = data.get("average_price")
+    transaction_obj.quantity = data.get("quantity")
+    transaction_obj.amount = transaction_obj.price * transaction_obj.quantity
+    transaction_obj.verified = True
+    transaction_obj.status = "Completed"
+    transaction_obj.zerodha_postback = data
+    transaction_obj.save()
+    apply_fill(transaction_obj)
+
+    admin_notification = AdminNotification(
+        notification_type="TRADE",
+        title="New trade!",
+        content=f"A new trade just took place, ID : ORD{transaction_obj.id}.",
+    )
+
+    user = transaction_obj.user
+    notification_type = (
+        "Purchase" if transaction_obj.transaction_type == "BUY" else "Sale"
+    )
+    head = f"{notification_type} Complete!"
+    body = f"Your {notification_type.lower()} order for {transaction_obj.trading_symbol} was completed successfully!"
+    notification = Notification(
+        user=user, notification_type=notification_type, head=head, body=body
+    )
+
+    registration_id = None
+    try:
+        if user.settings.notification_preference:
+            registration_id = user.settings.device_token
+            if not registration_id:
+                print("No device_token exist for user, aborting notification service.")
+    except UserSetting.DoesNotExist:
+        print("No Settings exist for user, aborting notification service.")
+
+    dedupe_key = f"ORD{transaction_obj.id}:{status}"
+    return admin_notification, notification, registration_id, dedupe_key
+
+
+def process_postback_batch(batch_size):
+    """
+    Apply up to batch_size pending postbacks in arrival order. Rows are claimed
+    with SKIP LOCKED so several workers can drain the queue together. A failing
+    postback records its error and stays pending until retry_at, with the delay
+    doubling per attempt; after POSTBACK_MAX_ATTEMPTS it is marked dead. Returns
+    the number of postbacks picked up.
+    """
+    results = []
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            PostBack.objects.select_for_update(skip_locked=True)
+            .filter(processed=False)
+            .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now))[:batch_size]
+        )
+        for postback in batch:
+            postback.attempts += 1
+            try:
+                with transaction.atomic():
+                    result = apply_postback(postback.payload)
+            except Exception as e:
+                postback.error = str(e)
+                if postback.attempts < POSTBACK_MAX_ATTEMPTS:
+                    delay = POSTBACK_RETRY_DELAY * 2 ** (postback.attempts - 1)
+                    postback.retry_at = now + timedelta(seconds=delay)
+                    print(f"Postback {postback.id} failed, retrying in {delay}s: {e}")
+                else:
+                    postback.dead = True
+                    postback.processed = True
+                    postback.processed_at = now
+                    print(f"Postback {postback.id} failed {postback.attempts} times, giving up: {e}")
+                continue
+            if result:
+                results.append(result)
+            postback.processed = True
+            postback.processed_at = now
+        PostBack.objects.bulk_update(
+            batch,
+            ["processed", "processed_at", "error", "attempts", "retry_at", "dead"],
+        )
+
+        AdminNotification.objects.bulk_create([x[0] for x in results])
+        notifications = NotificationBuffer()
+        for _, notification, registration_id, dedupe_key in results:
+            notifications.add(notification, registration_id, dedupe_key)
+        # Pushes are queued once this transaction commits.
+        notifications.flush()
+
+    return len(batch)
@@ -49,7 +49,8 @@ class UploadedFileSerializer(serializers.ModelSerializer):
         profile_photo = super().create(validated_data)
         profile = request.user.profile
         profile.profile_photo = profile_photo
-        profile.save()
+        # The profile may be the auth-cached copy; only write the photo.
+        profile.save(update_fields=["profile_photo"])
         return profile_photo
 
 
@@ -225,6 +226,7 @@ class TransactionSerializer(serializers.ModelSerializer):
             "amount",
             "transaction_type",
             "if_not_invest_then_what",
+            "realized_pnl",
             "created_at",
         ]
 
@@ -248,6 +250,8 @@ class PortfolioTransactionSerializer(serializers.Serializer):
     quantity = serializers.IntegerField()
     purchased_value = serializers.FloatField()
     current_value = serializers.FloatField()
+    unrealized_pnl = serializers.FloatField()
+    realized_pnl = serializers.FloatField()
     percentage = serializers.FloatField()
 
 
@@ -256,9 +260,15 @@ class PortfolioSerializer(serializers.Serializer):
     num_of_transactions = serializers.IntegerField()
     total_purchase_value = serializers.FloatField()
     total_current_value = serializers.FloatField()
+    total_unrealized_pnl = serializers.FloatField()
+    total_realized_pnl = serializers.FloatField()
 
 
 class JournalSerializer(serializers.ModelSerializer):
+    # Serializes .values() rows, see JournalViewSet.list.
+    open_quantity = serializers.IntegerField(source="lot__open_quantity", read_only=True)
+    realized_pnl = serializers.FloatField(source="lot__realized_pnl", read_only=True)
+
     class Meta:
         model = Transaction
         fields = [
@@ -266,6 +276,8 @@ class JournalSerializer(serializers.ModelSerializer):
             "amount",
             "status",
             "if_not_invest_then_what",
+            "open_quantity",
+            "realized_pnl",
             "created_at",
         ]
 
@@ -0,0 +1,170 @@
+import sys
+import threading
+import time
+
+from core.cache import get_symbol_map
+from core.models import ZerodhaData
+from core.utils import upsert_market_quotes
+from django.conf import settings
+from django.db.models import Q
+from kiteconnect import KiteTicker
+from twisted.internet import reactor
+
+from api.utils import KiteBusyException, check_kyc_status, invalidate_kyc_status
+
+
+class TickCoalescer:
+    """
+    Keeps only the latest price/change per instrument between flushes, so a
+    burst of ticks for one instrument costs a single row write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}
+        self.received = 0
+
+    def add(self, ticks):
+        with self._lock:
+            for tick in ticks:
+                price = tick["last_price"]
+                close = tick.get("ohlc", {}).get("close") or price
+                self._latest[tick["instrument_token"]] = {
+                    "price": price,
+                    "change": price - close,
+                }
+            self.received += len(ticks)
+
+    def drain(self):
+        with self._lock:
+            latest, self._latest = self._latest, {}
+            received, self.received = self.received, 0
+        return latest, received
+
+
+class QuoteStreamer:
+    """
+    Subscribes to the Kite tick stream for every MarketQuote with an
+    instrument_token and flushes the coalesced prices on an interval.
+    """
+
+    def __init__(self, flush_interval=None, root=None):
+        self.flush_interval = flush_interval or settings.QUOTE_STREAM_FLUSH_INTERVAL
+        self.root = root or settings.KITE_TICKER_ROOT
+        self.coalescer = TickCoalescer()
+        self.max_down_intervals = settings.QUOTE_STREAM_MAX_DOWN_INTERVALS
+        self.token_symbols = {}
+        self.ticker = None
+        self.stored_credentials = False
+        self.down_intervals = 0
+        self.gave_up = False
+
+    def load_tokens(self):
+        return get_symbol_map().tokens
+
+    def on_connect(self, ws, response):
+        tokens = list(self.token_symbols)
+        ws.subscribe(tokens)
+        ws.set_mode(ws.MODE_QUOTE, tokens)
+        print(f"Subscribed to {len(tokens)} instruments")
+
+    def on_ticks(self, ws, ticks):
+        self.coalescer.add(ticks)
+
+    def on_close(self, ws, code, reason):
+        print(f"Tick stream closed: {code} {reason}")
+
+    def on_error(self, ws, code, reason):
+        print(f"Tick stream error: {code} {reason}")
+
+    def on_noreconnect(self, ws):
+        # KiteTicker has used up its own retries; run() rebuilds it.
+        print("Tick stream gave up reconnecting")
+        self.gave_up = True
+
+    def resubscribe(self, token_symbols):
+        # The ticker runs inside the reactor thread, so hand the calls over.
+        ws = self.ticker
+        removed = [x for x in self.token_symbols if x not in token_symbols]
+        added = [x for x in token_symbols if x not in self.token_symbols]
+        self.token_symbols = token_symbols
+        if removed:
+            reactor.callFromThread(ws.unsubscribe, removed)
+        if added:
+            reactor.callFromThread(ws.subscribe, added)
+            reactor.callFromThread(ws.set_mode, ws.MODE_QUOTE, added)
+
+    def flush(self):
+        latest, received = self.coalescer.drain()
+        quote_data = {
+            self.token_symbols[token]: values
+            for token, values in latest.items()
+            if token in self.token_symbols
+        }
+        updated = 0
+        if quote_data:
+            updated, _ = upsert_market_quotes(quote_data)
+        return received, updated
+
+    def credentials(self):
+        """Stored api key and access token, refreshed first if Kite rejects it."""
+        zerodha_data: ZerodhaData = ZerodhaData.objects.filter(
+            ~Q(refresh_token="")
+        ).first()
+        invalidate_kyc_status(zerodha_data.local_user_id)
+        try:
+            check_kyc_status(zerodha_data.local_user)
+        except KiteBusyException:
+            print("Kite rate limit reached, connecting with the stored access token")
+        zerodha_data.refresh_from_db()
+        return zerodha_data.api_key, zerodha_data.access_token
+
+    def connect(self, api_key=None, access_token=None):
+        self.stored_credentials = api_key is None or access_token is None
+        if self.stored_credentials:
+            api_key, access_token = self.credentials()
+
+        self.token_symbols = self.load_tokens()
+        self.down_intervals = 0
+        self.gave_up = False
+        self.ticker = KiteTicker(api_key, access_token, root=self.root)
+        self.ticker.on_connect = self.on_connect
+        self.ticker.on_ticks = self.on_ticks
+        self.ticker.on_close = self.on_close
+        self.ticker.on_error = self.on_error
+        self.ticker.on_noreconnect = self.on_noreconnect
+        self.ticker.connect(threaded=True)
+
+    def reconnect(self):
+        """
+        Replace a ticker that stays down, e.g. after the daily token expiry.
+        A token passed on the command line can't be refreshed here, so exit
+        and let the supervisor restart the worker instead.
+        """
+        if not self.stored_credentials:
+            print("Tick stream is down and the given access token can't be refreshed")
+            sys.exit(1)
+
+        print(f"Tick stream down for {self.down_intervals} intervals, reconnecting")
+        reactor.callFromThread(self.ticker.close)
+        self.connect()
+
+    def run(self, api_key=None, access_token=None):
+        self.connect(api_key, access_token)
+        while True:
+            time.sleep(self.flush_interval)
+            started = time.monotonic()
+            received, updated = self.flush()
+            if self.ticker.is_connected():
+                self.down_intervals = 0
+                token_symbols = self.load_tokens()
+                if token_symbols.keys() != self.token_symbols.keys():
+                    self.resubscribe(token_symbols)
+            else:
+                self.down_intervals += 1
+                if self.gave_up or self.down_intervals >= self.max_down_intervals:
+                    self.reconnect()
+            print(
+                f"Flushed {updated} quotes from {received} ticks "
+                f"in {(time.monotonic() - started) * 1000:.1f}ms"
+            )
@@ -1,132 +1,192 @@
-import requests
-from celery import shared_task
-from api.utils import check_kyc_status, refresh_access_token
+from datetime import datetime
+
+from celery import chord, shared_task
+from api import kite, ratelimit
+from api.authentication import invalidate_auth_cache
+from api.postbacks import process_postback_batch
+from api.utils import (
+    KiteBusyException,
+    check_kyc_status,
+    fetch_market_quotes,
+    refresh_access_token,
+)
+from core.cache import get_symbol_map
 from core.models import (
+    Holding,
     InvestmentInsight,
+    JobReport,
     MarketQuote,
     Stock,
-    User,
+    UserSetting,
     UserSubscription,
     ZerodhaData,
 )
-from core.utils import send_notification
+from core.portfolio import value_holdings
+from core.notifications import NotificationBuffer
+from core.utils import upsert_market_quotes
+from django.conf import settings
+from django.db import connection
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Max, Min, Q
+
+PORTFOLIO_SHARD_SIZE = settings.PORTFOLIO_SHARD_SIZE
+POSTBACK_BATCH_SIZE = settings.POSTBACK_BATCH_SIZE
+# Expired users whose device tokens are loaded per query.
+EXPIRY_BATCH_SIZE = 1000
 
 
 @shared_task
 def update_stock_prices():
     
     latest_zerodha_data: ZerodhaData = ZerodhaData.objects.filter(~Q(refresh_token='')).first()
-    check_kyc_status(latest_zerodha_data.local_user)
+    try:
+        check_kyc_status(latest_zerodha_data.local_user)
+    except KiteBusyException:
+        print("Kite rate limit reached, skipping this stock price refresh")
+        return
     latest_zerodha_data.refresh_from_db()
 
     access_token = latest_zerodha_data.access_token
     api_key = latest_zerodha_data.api_key
-    headers = {
-        "X-Kite-Version": "3",
-        "Authorization": f"token {api_key}:{access_token}",
-    }
-
-    stocks = MarketQuote.objects.values_list("trading_symbol")
-    stocks = [_[0] for _ in stocks]
-    query_string = ""
-    for stock in stocks:
-        query_string = query_string + f"&i=NSE:{stock}"
-
-    query_string = query_string.strip("&")
-    response = requests.get(
-        f"https://api.kite.trade/quote?{query_string}", headers=headers
-    )
 
-    if response.status_code == 200:
-        for k, v in response.json()["data"].items():
+    instruments = [
+        f"{exchange}:{symbol}" for exchange, symbol in get_symbol_map().quotes
+    ]
+    quotes = fetch_market_quotes(instruments, access_token, api_key)
+
+    if quotes:
+        quote_data = {}
+        for k, v in quotes.items():
             exchange, symbol = k.split(":")
             price = v["last_price"]
             close = v["ohlc"]["close"]
-
-            try:
-                market_quote: MarketQuote = MarketQuote.objects.get(
-                    trading_symbol=symbol
-                )
-                change = price - close
-                market_quote.price = price
-                market_quote.change = change
-                market_quote.save()
-            except MarketQuote.DoesNotExist:
-                print(f"Failed to update MarketQuote for {symbol}")
+            quote_data[(exchange, symbol)] = {
+                "price": price,
+                "change": price - close,
+                "instrument_token": str(v["instrument_token"]),
+            }
+        upsert_market_quotes(quote_data)
     else:
         print("Unable to refresh stocks data from Zerodha")
+    print(f"Kite client stats: {kite.get_stats()}")
+    print(f"Kite rate limiter stats: {ratelimit.get_stats()}")
 
 
 @shared_task
 def calculate_portfolio_value():
-    market_quotes = MarketQuote.objects.all().values()
-    for user in User.objects.all():
-        transactions = user.transactions.filter(verified=True)
-        if not transactions:
-            continue
-
-        transaction_data = {}
-        for transaction in transactions:
-            symbol = transaction.trading_symbol
-            if symbol in transaction_data:
-                if transaction.transaction_type == "SELL":
-                    transaction_data[symbol]["quantity"] -= transaction.quantity
-                else:
-                    transaction_data[symbol]["quantity"] += transaction.quantity
-            else:
-                transaction_data[symbol] = {
-                    "trading_symbol": symbol,
-                    "quantity": 0,
-                }
-                if transaction.transaction_type == "SELL":
-                    transaction_data[symbol]["quantity"] = -transaction.quantity
-                else:
-                    transaction_data[symbol]["quantity"] = transaction.quantity
-
-        portfolio_list = [v for k, v in transaction_data.items() if v["quantity"] != 0]
-
-        portfolio_value = 0
-        for entry in portfolio_list:
-            trading_symbol = entry["trading_symbol"]
-            price = [
-                x["price"]
-                for x in market_quotes
-                if x["trading_symbol"] == trading_symbol
-            ]
-            if not price:
-                continue
-            price = price[0]
-            portfolio_value += price * entry["quantity"]
-
-        InvestmentInsight.objects.create(user=user, value=portfolio_value)
+    """
+    Split users into id-range shards and value them in parallel against one
+    snapshot of quote prices; record_portfolio_valuation collects the totals.
+    """
+    started_at = timezone.now()
+    # Bare symbols are unique here: the stock list is uploaded as NSE only, and
+    # holdings are one row per (user, trading_symbol) whatever the exchange.
+    prices = dict(MarketQuote.objects.values_list("trading_symbol", "price"))
+    user_range = Holding.objects.aggregate(first=Min("user_id"), last=Max("user_id"))
+    if user_range["first"] is None:
+        return
+
+    shards = [
+        value_portfolio_shard.s(start_id, start_id + PORTFOLIO_SHARD_SIZE, prices)
+        for start_id in range(
+            user_range["first"], user_range["last"] + 1, PORTFOLIO_SHARD_SIZE
+        )
+    ]
+    chord(shards)(record_portfolio_valuation.s(started_at.isoformat()))
 
 
 @shared_task
-def deactivate_subscriptions():
-    current_datetime = timezone.now()
-    expired_subscriptions = UserSubscription.objects.filter(
-        date_to__lte=current_datetime
+def value_portfolio_shard(start_id, end_id, prices):
+    """Value users with start_id <= id < end_id and store their insights."""
+    _, valuation = value_holdings(
+        Holding.objects.filter(user_id__gte=start_id, user_id__lt=end_id).values_list(
+            "user_id", "trading_symbol", "quantity", "invested_amount"
+        ),
+        prices,
+    )
+    portfolio_values = valuation.owner_totals()
+
+    InvestmentInsight.objects.bulk_create(
+        [
+            InvestmentInsight(user_id=user_id, value=value)
+            for user_id, value in portfolio_values.items()
+        ],
+        batch_size=5000,
     )
+    return {"users": len(portfolio_values), "value": sum(portfolio_values.values())}
 
-    # Mark expired subscriptions as inactive
-    UserSubscription.objects.filter(date_to__lte=current_datetime).update(active=False)
 
-    # Send notifictaions
-    for subscription in expired_subscriptions:
-        user_settings = subscription.user.settings
+@shared_task
+def record_portfolio_valuation(results, started_at):
+    report = JobReport.objects.create(
+        name="calculate_portfolio_value",
+        started_at=datetime.fromisoformat(started_at),
+        data={
+            "shards": len(results),
+            "users": sum(x["users"] for x in results),
+            "total_value": sum(x["value"] for x in results),
+        },
+    )
+    print(f"Portfolio valuation report: {report.data} in {report.duration:.2f}s")
 
-        head = f"Subscription Expired!"
-        body = f" Alert! Your subscription has ended. Subscribe again if you wish to continue with premium service."
 
-        registration_id = user_settings.device_token
-        if registration_id:
-            send_notification(
-                registration_id=registration_id, message_title=head, message_body=body
+@shared_task
+def deactivate_subscriptions():
+    """
+    Deactivate subscriptions that expired since the last run and tell their
+    owners. Already inactive rows are never touched again, so the cost tracks
+    the day's expiries rather than the whole history.
+    """
+    started_at = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {UserSubscription._meta.db_table} SET active = false "
+            "WHERE active AND date_to <= %s RETURNING user_id",
+            [started_at],
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+    # The subscription is cached with the user's auth token.
+    for i in range(0, len(user_ids), EXPIRY_BATCH_SIZE):
+        invalidate_auth_cache(*user_ids[i : i + EXPIRY_BATCH_SIZE])
+
+    head = f"Subscription Expired!"
+    body = f" Alert! Your subscription has ended. Subscribe again if you wish to continue with premium service."
+
+    notifications = NotificationBuffer()
+    for i in range(0, len(user_ids), EXPIRY_BATCH_SIZE):
+        registration_ids = (
+            UserSetting.objects.filter(user_id__in=user_ids[i : i + EXPIRY_BATCH_SIZE])
+            .exclude(device_token__isnull=True)
+            .exclude(device_token="")
+            .values_list("device_token", flat=True)
+        )
+        for registration_id in registration_ids:
+            notifications.push(
+                registration_id, head, body, dedupe_key=f"expired:{started_at.date()}"
             )
-        else:
-            print("No device_token exist for user, aborting notification service.")
+    _, pushed = notifications.flush()
+
+    report = JobReport.objects.create(
+        name="deactivate_subscriptions",
+        started_at=started_at,
+        data={"expired": len(user_ids), "notified": pushed},
+    )
+    print(
+        f"Deactivated {len(user_ids)} subscriptions, notified {pushed} devices "
+        f"in {report.duration:.1f}s"
+    )
+
+@shared_task
+def process_postbacks():
+    """Drain the PostBack queue. Queued by PostBackView, and every minute as a fallback."""
+    total = 0
+    while True:
+        processed = process_postback_batch(POSTBACK_BATCH_SIZE)
+        total += processed
+        if processed < POSTBACK_BATCH_SIZE:
+            break
+    return total
+
 
 @shared_task
 def temp():
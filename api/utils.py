@@ -1,64 +1,189 @@
-import hashlib
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
 
+import httpx
+import redis
 import requests
+from api import kite, ratelimit
+from asgiref.sync import sync_to_async
+from core.cache import get_redis_connection
 from core.models import User, ZerodhaData
 from django.conf import settings
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.exceptions import APIException
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
 
 KITE_CREDS = settings.KITE_CREDS
+KITE_QUOTE_BATCH_SIZE = settings.KITE_QUOTE_BATCH_SIZE
+KITE_QUOTE_WORKERS = settings.KITE_QUOTE_WORKERS
+KITE_RATE_LIMITS = settings.KITE_RATE_LIMITS
+KITE_RATE_LIMIT_MAX_WAIT = settings.KITE_RATE_LIMIT_MAX_WAIT
+KYC_CACHE_TTL = settings.KYC_CACHE_TTL
+KITE_SESSION_EXPIRY_HOUR = settings.KITE_SESSION_EXPIRY_HOUR
+KITE_REFRESH_LOCK_TIMEOUT = settings.KITE_REFRESH_LOCK_TIMEOUT
+KITE_REFRESH_LOCK_WAIT = settings.KITE_REFRESH_LOCK_WAIT
+KITE_REFRESH_RESULT_TTL = settings.KITE_REFRESH_RESULT_TTL
 
 
 def parse_serializer_errors(serializer):
     return " ".join("".join(x).title() for e, x in serializer.errors.items())
 
 
+def _kyc_cache_key(user_id):
+    return f"kyc:{user_id}"
+
+
+def _kyc_cache_ttl():
+    """KYC_CACHE_TTL, cut short at the next Kite session expiry."""
+    now = timezone.localtime()
+    expiry = now.replace(hour=KITE_SESSION_EXPIRY_HOUR, minute=0, second=0, microsecond=0)
+    if expiry <= now:
+        expiry += timedelta(days=1)
+    return max(1, min(KYC_CACHE_TTL, int((expiry - now).total_seconds())))
+
+
+def cache_kyc_status(user_id):
+    try:
+        get_redis_connection().set(_kyc_cache_key(user_id), 1, ex=_kyc_cache_ttl())
+    except redis.RedisError as e:
+        print(f"Failed to cache KYC status: {e}")
+
+
+def invalidate_kyc_status(user_id):
+    try:
+        get_redis_connection().delete(_kyc_cache_key(user_id))
+    except redis.RedisError as e:
+        print(f"Failed to invalidate KYC status: {e}")
+
+
+def is_kyc_cached(user_id):
+    try:
+        return bool(get_redis_connection().exists(_kyc_cache_key(user_id)))
+    except redis.RedisError as e:
+        print(f"Failed to read KYC status cache: {e}")
+        return False
+
+
 def check_kyc_status(user: User):
+    if is_kyc_cached(user.id):
+        return True
+
     try:
         zerodha_data: ZerodhaData = ZerodhaData.objects.get(local_user=user)
         access_token = zerodha_data.access_token
     except ZerodhaData.DoesNotExist:
         return False
 
-    api_key = KITE_CREDS["api_key"]
-
-    headers = {
-        "X-Kite-Version": "3",
-        "Authorization": f"token {api_key}:{access_token}",
-    }
-    resp = requests.get("https://api.kite.trade/user/margins", headers=headers)
+    try:
+        resp = kite.get_margins(access_token)
+    except ratelimit.RateLimitExceeded:
+        raise KiteBusyException()
+    except requests.RequestException as e:
+        print(f"KYC check could not reach Kite: {e}")
+        return False
     if resp.status_code != 200:
         return refresh_access_token(zerodha_data)
+    cache_kyc_status(user.id)
     return True
 
 
-def refresh_access_token(zerodha_data: ZerodhaData):
+async def async_check_kyc_status(user: User):
+    """check_kyc_status for the async views; the Kite call doesn't hold a thread."""
+    if await sync_to_async(is_kyc_cached)(user.id):
+        return True
 
-    api_key = KITE_CREDS["api_key"]
-    apy_secret = KITE_CREDS["secret"]
+    try:
+        zerodha_data: ZerodhaData = await sync_to_async(ZerodhaData.objects.get)(
+            local_user=user
+        )
+    except ZerodhaData.DoesNotExist:
+        return False
 
     try:
-        refresh_token = zerodha_data.refresh_token
+        resp = await kite.async_get_margins(zerodha_data.access_token)
+    except ratelimit.RateLimitExceeded:
+        raise KiteBusyException()
+    except httpx.HTTPError as e:
+        print(f"KYC check could not reach Kite: {e}")
+        return False
+    if resp.status_code != 200:
+        return await sync_to_async(refresh_access_token)(zerodha_data)
+    await sync_to_async(cache_kyc_status)(user.id)
+    return True
+
+
+def _refresh_lock_key(zerodha_data: ZerodhaData):
+    return f"zerodha-refresh:{zerodha_data.user_id or zerodha_data.pk}"
+
 
-        h = hashlib.sha256(
-            api_key.encode("utf-8")
-            + refresh_token.encode("utf-8")
-            + apy_secret.encode("utf-8")
+def refresh_access_token(zerodha_data: ZerodhaData):
+    """
+    Single-flight wrapper around the Kite refresh call.
+
+    Callers racing on the same account wait on a Redis lock; whoever gets it
+    after the token was already rotated (or a refresh just failed) reuses that
+    outcome instead of posting the refresh token again.
+    """
+    invalidate_kyc_status(zerodha_data.local_user_id)
+
+    key = _refresh_lock_key(zerodha_data)
+    result_key = f"{key}:result"
+    seen_access_token = zerodha_data.access_token
+
+    try:
+        conn = get_redis_connection()
+        lock = conn.lock(
+            key, timeout=KITE_REFRESH_LOCK_TIMEOUT, blocking_timeout=KITE_REFRESH_LOCK_WAIT
         )
-        checksum = h.hexdigest()
+        acquired = lock.acquire()
+    except redis.RedisError as e:
+        print(f"Refresh lock unavailable, refreshing without it: {e}")
+        return _refresh_access_token(zerodha_data)
+
+    if not acquired:
+        print(f"Timed out waiting for token refresh of {key}")
+        return False
+
+    try:
+        try:
+            zerodha_data.refresh_from_db(fields=["access_token", "refresh_token"])
+        except ZerodhaData.DoesNotExist:
+            return False
+
+        if zerodha_data.access_token != seen_access_token:
+            # Rotated by whoever held the lock before us.
+            return True
 
-        url = "https://api.kite.trade/session/refresh_token"
+        if conn.get(result_key) == b"0":
+            # The refresh token was just rejected; don't hammer Kite with it.
+            return False
 
-        data = {
-            "api_key": api_key,
-            "refresh_token": refresh_token,
-            "checksum": checksum,
-        }
+        refreshed = _refresh_access_token(zerodha_data)
+        conn.set(result_key, int(refreshed), ex=KITE_REFRESH_RESULT_TTL)
+        return refreshed
+    except redis.RedisError as e:
+        print(f"Failed to record token refresh result: {e}")
+        return zerodha_data.access_token != seen_access_token
+    finally:
+        try:
+            lock.release()
+        except (redis.exceptions.LockError, redis.RedisError):
+            pass
+
+
+def _refresh_access_token(zerodha_data: ZerodhaData):
+    try:
+        resp = kite.refresh_session(zerodha_data.refresh_token)
 
-        resp = requests.post(url,data=data)
-        
         json_data = resp.json()["data"]
 
         access_token = json_data["access_token"]
@@ -70,11 +195,49 @@ def refresh_access_token(zerodha_data: ZerodhaData):
         zerodha_data.save()
 
         return True
+    except ratelimit.RateLimitExceeded:
+        raise KiteBusyException()
     except Exception as e:
         print(e)
         return False
 
 
+def fetch_quote_batch(instruments, access_token, api_key=None, rate_limit_wait=None):
+    try:
+        resp = kite.get_quotes(instruments, access_token, api_key, rate_limit_wait)
+    except requests.RequestException as e:
+        print(f"Quote batch of {len(instruments)} instruments failed: {e}")
+        return {}
+    if resp.status_code != 200:
+        print(
+            f"Quote batch of {len(instruments)} instruments failed with {resp.status_code}"
+        )
+        return {}
+    return resp.json()["data"]
+
+
+def fetch_market_quotes(instruments, access_token, api_key=None):
+    """
+    Fetch quotes for "EXCHANGE:SYMBOL" instruments in bounded batches,
+    concurrently, and merge the results. A failed batch is skipped.
+    """
+    batches = [
+        instruments[i : i + KITE_QUOTE_BATCH_SIZE]
+        for i in range(0, len(instruments), KITE_QUOTE_BATCH_SIZE)
+    ]
+    # Batches queue behind the quote rate limit; give each run enough room
+    # to drain instead of shedding the tail.
+    rate_limit_wait = KITE_RATE_LIMIT_MAX_WAIT + len(batches) / KITE_RATE_LIMITS["quote"]
+    quotes = {}
+    with ThreadPoolExecutor(max_workers=KITE_QUOTE_WORKERS) as executor:
+        for data in executor.map(
+            lambda x: fetch_quote_batch(x, access_token, api_key, rate_limit_wait),
+            batches,
+        ):
+            quotes.update(data)
+    return quotes
+
+
 def uuid_to_alphanumeric():
     return str(uuid.uuid4()).replace("-", "")[:20]
 
@@ -87,11 +250,128 @@ class NoDataException(APIException):
     }
 
 
+class KiteBusyException(APIException):
+    """Our own Kite rate limit shed the call; not a KYC failure."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = {
+        "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+        "message": "Zerodha is busy, please try again shortly",
+    }
+
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 500
     page_query_param = "page"
 
 
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id): every page is an index range scan
+    from the cursor, with no OFFSET and no COUNT(*). Used for notifications;
+    the date-grouped transaction and journal feeds page with
+    DateCursorPagination, the same design keyed on the created_at date.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class CursorOrPageNumberPagination(BasePagination):
+    """
+    page_number_class unless the request carries a `cursor` param (empty for
+    the first page), in which case cursor_class is used. Existing clients that
+    page by number keep working.
+    """
+
+    cursor_class = CreatedAtCursorPagination
+    page_number_class = StandardResultsSetPagination
+
+    def get_paginator(self, request):
+        if self.cursor_class.cursor_query_param in request.query_params:
+            return self.cursor_class()
+        return self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(
+            view
+        ) + self.cursor_class().get_schema_operation_parameters(view)
+
+
+class DateCursorPagination(CreatedAtCursorPagination):
+    """Keyset pagination over the distinct dates of paginate_date_groups()."""
+
+    ordering = ("-date",)
+    page_size = 30
+    max_page_size = 90
+
+
+class DatePageNumberPagination(StandardResultsSetPagination):
+    """
+    Page-number pagination over the distinct dates of paginate_date_groups():
+    a page holds up to page_size dates and `count` is the number of dates.
+    """
+
+    page_size = 30
+
+
+class DateGroupPagination(CursorOrPageNumberPagination):
+    """
+    Pagination for the date-grouped transaction and journal feeds. Pages are
+    counted in dates for both paths, which replaces CreatedAtCursorPagination
+    on those feeds.
+    """
+
+    cursor_class = DateCursorPagination
+    page_number_class = DatePageNumberPagination
+
+
+def paginate_date_groups(view, queryset, fields, key):
+    """
+    Page a Transaction queryset by created_at date so a day's rows are never
+    split across pages, and return [{"date": date, key: [row, ...]}, ...] built
+    from a .values() projection of `fields`, newest first.
+
+    Two queries: the page of distinct TruncDate(created_at) values, then the
+    rows between the page's oldest and newest date, grouped as they stream in.
+    Dates are in TIME_ZONE, like the feeds' from_date/to_date filters (rows
+    used to be grouped by their UTC date).
+    """
+    dates = view.paginate_queryset(
+        queryset.annotate(date=TruncDate("created_at"))
+        .values("date")
+        .order_by("-date")
+        .distinct()
+    )
+    if not dates:
+        return []
+
+    rows = (
+        queryset.filter(
+            created_at__date__range=(dates[-1]["date"], dates[0]["date"])
+        )
+        .annotate(date=TruncDate("created_at"))
+        .values("date", *fields)
+        .order_by("-created_at", "-id")
+    )
+    return [
+        {"date": date, key: list(group)}
+        for date, group in groupby(rows.iterator(), key=itemgetter("date"))
+    ]
+
+
 PAN_REGEX = r"[A-Za-z]{5}\d{4}[A-Za-z]{1}"
 
 
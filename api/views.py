@@ -4,7 +4,6 @@ from datetime import timedelta
 from adminpanel.models import FAQ, AdminNotification, ContactData, StaticData, Tip
 from core.models import (
     EmailVerificationRecord,
-    MarketQuote,
     Notification,
     Transaction,
     UploadedFile,
@@ -16,9 +15,10 @@ from core.models import (
 )
 
 from random import choice
+from core.cache import get_cached_quotes, get_price_index
+from core.portfolio import value_holdings
 from core.utils import send_notification
 from django.core.mail import send_mail
-from django.db.models import Q
 from django.http import HttpResponse, HttpResponseNotFound
 from django.urls import reverse
 from django.utils import timezone
@@ -30,7 +30,6 @@ from drf_spectacular.utils import (
     inline_serializer,
 )
 from rest_framework import mixins, serializers, status, viewsets
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
@@ -39,6 +38,11 @@ from rest_framework.views import APIView
 from django.template import loader
 from django.core.mail import EmailMessage
 
+from api.authentication import (
+    CachedTokenAuthentication,
+    forget_tokens,
+    invalidate_auth_cache,
+)
 from api.serializers import (
     AboutUsSerializer,
     BasicUserSerializer,
@@ -68,7 +72,13 @@ from api.serializers import (
     UserSubscriptionHistorySerializer,
     UserSubscriptionSerializer,
 )
-from api.utils import NoDataException, StandardResultsSetPagination
+from api.utils import (
+    CursorOrPageNumberPagination,
+    DateGroupPagination,
+    NoDataException,
+    StandardResultsSetPagination,
+    paginate_date_groups,
+)
 
 from .custom_viewsets import GetPostViewSet, GetViewSet, ListGetUpdateViewSet
 
@@ -111,6 +121,7 @@ class ResetPasswordView(APIView):
                     )
                 user.set_password(request.data["new_password"])
                 user.save()
+                invalidate_auth_cache(user.id)
             else:
                 return Response(
                     {
@@ -279,7 +290,7 @@ class LoginView(APIView):
 
 
 class LogoutView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(
@@ -294,6 +305,7 @@ class LogoutView(APIView):
     )
     def post(self, request: Request, *args, **kwargs):
         request.user.auth_token.delete()
+        forget_tokens([request.auth.key])
         return Response(
             {
                 "errors": None,
@@ -302,11 +314,12 @@ class LogoutView(APIView):
         )
 
 class DeleteUserView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def post(self, request: Request, *args, **kwargs):
         request.user.delete()
+        forget_tokens([request.auth.key])
         return Response(
             {
                 "success": True,
@@ -325,7 +338,7 @@ class DeleteUserView(APIView):
 )
 class UserProfilePhotoViewSet(GetPostViewSet):
     serializer_class = UploadedFileSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -337,11 +350,14 @@ class UserProfilePhotoViewSet(GetPostViewSet):
 
 class UserProfileViewSet(GetPostViewSet):
     serializer_class = UserProfileSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         try:
+            if self.request.method == "GET":
+                return self.request.user.profile
+            # Writes start from the current row, not the auth-cached copy.
             return UserProfile.objects.get(user=self.request.user)
         except UserProfile.DoesNotExist:
             raise NoDataException
@@ -349,20 +365,26 @@ class UserProfileViewSet(GetPostViewSet):
 
 class BasicUserViewSet(GetPostViewSet):
     serializer_class = BasicUserSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        return self.request.user
+        if self.request.method == "GET":
+            return self.request.user
+        # Writes start from the current row, not the auth-cached copy.
+        return User.objects.get(id=self.request.user.id)
 
 
 class UserSettingViewSet(GetPostViewSet):
     serializer_class = UserSettingSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         try:
+            if self.request.method == "GET":
+                return self.request.user.settings
+            # Writes start from the current row, not the auth-cached copy.
             return UserSetting.objects.get(user=self.request.user)
         except UserSetting.DoesNotExist:
             raise NoDataException
@@ -370,7 +392,7 @@ class UserSettingViewSet(GetPostViewSet):
 
 class GetFundsViewSet(GetViewSet):
     serializer_class = FundsSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -421,6 +443,7 @@ class TipViewSet(GetViewSet):
         return Tip.objects.filter(is_active=True).first()
 
 class NotificationViewSet(ListGetUpdateViewSet):
+    pagination_class = CursorOrPageNumberPagination
     serializer_class = NotificationSerializer
 
     def get_queryset(self):
@@ -476,7 +499,7 @@ class NotificationViewSet(ListGetUpdateViewSet):
 
 class SubscriptionViewSet(GetViewSet):
     serializer_class = UserSubscriptionSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -485,7 +508,7 @@ class SubscriptionViewSet(GetViewSet):
 
 class SubscriptionHistoryViewSet(GetViewSet):
     serializer_class = UserSubscriptionHistorySerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     many = True
 
@@ -496,7 +519,7 @@ class SubscriptionHistoryViewSet(GetViewSet):
 class MarketFilterViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     pagination_class = StandardResultsSetPagination
     serializer_class = MarketQuoteSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -504,17 +527,7 @@ class MarketFilterViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         keyword = self.request.GET.get("keyword", None)
 
         price = float(price)
-        lower_price = price - 10
-
-        query = MarketQuote.objects.filter(price__gt=0).filter(price__lte=price, price__gte=lower_price)
-
-        if keyword:
-            query = query.filter(
-                Q(company_name__icontains=keyword)
-                | Q(trading_symbol__icontains=keyword)
-            )
-
-        return query
+        return get_price_index().band(price - 10, price, keyword)
 
     @extend_schema(
         parameters=[
@@ -548,9 +561,9 @@ class TransactionViewSet(
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet,
 ):
-    pagination_class = StandardResultsSetPagination
+    pagination_class = DateGroupPagination
     serializer_class = TransactionSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -584,20 +597,9 @@ class TransactionViewSet(
     )
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
-        transactions = self.paginate_queryset(queryset)
-
-        grouped_by_date = {}
-        for transaction in transactions:
-            created_at = str(transaction.created_at.date())
-            if created_at in grouped_by_date:
-                grouped_by_date[created_at].append(transaction)
-            else:
-                grouped_by_date[created_at] = [transaction]
-        grouped_by_date = [
-            {"date": key, "transactions": value}
-            for key, value in grouped_by_date.items()
-        ]
-
+        grouped_by_date = paginate_date_groups(
+            self, queryset, TransactionSerializer.Meta.fields, "transactions"
+        )
         serializer = TransactionGroupedByDateSerializer(grouped_by_date, many=True)
         return self.get_paginated_response(serializer.data)
 
@@ -629,7 +631,7 @@ class TransactionViewSet(
 
 class TransactionLatestView(APIView):
     serializer_class = TransactionSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
@@ -640,62 +642,56 @@ class TransactionLatestView(APIView):
 
 class PortFolioView(APIView):
     serializer_class = PortfolioSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
-        transactions = request.user.transactions.filter(verified=True)
-
-        transaction_data = {}
-        for transaction in transactions:
-            symbol = transaction.trading_symbol
-            if symbol in transaction_data:
-                if transaction.transaction_type == "SELL":
-                    transaction_data[symbol]["quantity"] -= transaction.quantity
-                    transaction_data[symbol]["purchased_value"] -= transaction.amount
-                else:
-                    transaction_data[symbol]["quantity"] += transaction.quantity
-                    transaction_data[symbol]["purchased_value"] += transaction.amount
-            else:
-                transaction_data[symbol] = {
+        all_holdings = list(
+            request.user.holdings.values_list(
+                "trading_symbol",
+                "exchange",
+                "quantity",
+                "invested_amount",
+                "realized_pnl",
+            )
+        )
+        holdings = [x for x in all_holdings if x[2] != 0]
+        current_stocks_data = get_cached_quotes([x[0] for x in holdings])
+        prices = {k: v["price"] for k, v in current_stocks_data.items()}
+        _, valuation = value_holdings(
+            [(request.user.id, x[0], x[2], x[3]) for x in holdings], prices
+        )
+
+        portfolio_list = []
+        for i, (symbol, exchange, quantity, invested_amount, realized_pnl) in enumerate(
+            holdings
+        ):
+            portfolio_list.append(
+                {
                     "trading_symbol": symbol,
-                    "exchange": transaction.exchange,
-                    "quantity": 0,
-                    "purchased_value": 0.0,
+                    "exchange": exchange,
+                    "quantity": quantity,
+                    "purchased_value": invested_amount,
+                    "company_name": current_stocks_data.get(symbol, {}).get(
+                        "company_name"
+                    ),
+                    "current_value": float(valuation.current_value[i]),
+                    "unrealized_pnl": float(valuation.pnl[i]),
+                    "realized_pnl": realized_pnl,
+                    "percentage": float(valuation.percentage[i]),
                 }
-
-                if transaction.transaction_type == "SELL":
-                    transaction_data[symbol]["quantity"] = -transaction.quantity
-                    transaction_data[symbol]["purchased_value"] = -transaction.amount
-                else:
-                    transaction_data[symbol]["quantity"] = transaction.quantity
-                    transaction_data[symbol]["purchased_value"] += transaction.amount
-
-        portfolio_list = [v for k, v in transaction_data.items() if v["quantity"] != 0]
-        stocks_list = [k for k, v in transaction_data.items() if v["quantity"] != 0]
-        current_stocks_data = {
-            x["trading_symbol"]: x
-            for x in MarketQuote.objects.filter(trading_symbol__in=stocks_list).values(
-                "company_name", "price", "trading_symbol"
             )
-        }
-
-        for entry in portfolio_list:
-            current_data = current_stocks_data[entry["trading_symbol"]]
-            entry["company_name"] = current_data["company_name"]
-            entry["current_value"] = current_data["price"] * entry["quantity"]
 
-        num_of_transactions = len(transactions)
-        total_purchase_value = sum([x["purchased_value"] for x in portfolio_list])
-        total_current_value = sum(x["current_value"] for x in portfolio_list)
-
-        for entry in portfolio_list:
-            entry["percentage"] = entry["current_value"] / total_current_value * 100
+        num_of_transactions = request.user.transactions.filter(verified=True).count()
+        total_purchase_value = float(valuation.owner_cost.sum())
+        total_current_value = float(valuation.owner_value.sum())
 
         data = {
             "num_of_transactions": num_of_transactions,
             "total_purchase_value": total_purchase_value,
             "total_current_value": total_current_value,
+            "total_unrealized_pnl": total_current_value - total_purchase_value,
+            "total_realized_pnl": sum(x[4] for x in all_holdings),
             "portfolio_list": portfolio_list,
         }
 
@@ -704,16 +700,29 @@ class PortFolioView(APIView):
         return Response(s.data)
 
 
+JOURNAL_FIELDS = [
+    "transaction_type",
+    "amount",
+    "status",
+    "if_not_invest_then_what",
+    "lot__open_quantity",
+    "lot__realized_pnl",
+    "created_at",
+]
+
+
 class JournalViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
-    pagination_class = StandardResultsSetPagination
+    pagination_class = DateGroupPagination
     serializer_class = JournalGroupedByDateSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         from_date = self.request.GET.get("from_date", None)
         to_date = self.request.GET.get("to_date", None)
-        query = self.request.user.transactions.filter(verified=True,transaction_type="BUY")
+        query = self.request.user.transactions.filter(
+            verified=True, transaction_type="BUY"
+        )
         if from_date:
             query = query.filter(created_at__date__gte=from_date)
         if to_date:
@@ -740,24 +749,16 @@ class JournalViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     )
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
-        entries = self.paginate_queryset(queryset)
-        grouped_by_date = {}
-        for entry in entries:
-            created_at = str(entry.created_at.date())
-            if created_at in grouped_by_date:
-                grouped_by_date[created_at].append(entry)
-            else:
-                grouped_by_date[created_at] = [entry]
-        grouped_by_date = [
-            {"date": key, "entries": value} for key, value in grouped_by_date.items()
-        ]
+        grouped_by_date = paginate_date_groups(
+            self, queryset, JOURNAL_FIELDS, "entries"
+        )
         serializer = JournalGroupedByDateSerializer(grouped_by_date, many=True)
         return self.get_paginated_response(serializer.data)
 
 
 class InvestmentInsightViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = InsightSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -797,7 +798,7 @@ class TradeViewSet(
     viewsets.GenericViewSet,
 ):
     serializer_class = TradeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -925,6 +926,7 @@ class VerifyEmailView(View):
                 user = record.user
                 user.is_email_verified = True
                 user.save()
+                invalidate_auth_cache(user.id)
                 record.delete()
                 return HttpResponse("Email Verification Complete!")
             except EmailVerificationRecord.DoesNotExist:
@@ -934,7 +936,7 @@ class VerifyEmailView(View):
 
 
 class SendVerififcationEmailView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(
@@ -990,7 +992,7 @@ class SendVerififcationEmailView(APIView):
             )
 
 class CheckOldPassword(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(
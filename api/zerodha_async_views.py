@@ -0,0 +1,182 @@
+"""
+Async versions of the Zerodha views that wait on Kite (check-status,
+refresh-funds, redirect). They are plain Django async views since DRF views
+are sync-only; responses match the DRF ones. Django 4.0 has no async ORM, so
+database work runs through sync_to_async while the Kite calls go through the
+httpx client without tying up a thread. Enabled by ZERODHA_ASYNC_VIEWS.
+"""
+import json
+
+import httpx
+from asgiref.sync import sync_to_async
+from core.models import User, ZerodhaData
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import render
+from django.utils import timezone
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+
+from api import kite, ratelimit
+from api.authentication import CachedTokenAuthentication
+from api.utils import KiteBusyException, async_check_kyc_status, invalidate_kyc_status
+
+KITE_CREDS = settings.KITE_CREDS
+
+
+async def _authenticate(request):
+    """CachedTokenAuthentication for plain async views. Returns (user, error response)."""
+    try:
+        result = await sync_to_async(CachedTokenAuthentication().authenticate)(Request(request))
+    except exceptions.AuthenticationFailed as e:
+        return None, JsonResponse({"detail": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+    if result is None:
+        return None, JsonResponse(
+            {"detail": exceptions.NotAuthenticated.default_detail},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    return result[0], None
+
+
+def _kyc_failed(**extra):
+    return JsonResponse(
+        {"errors": "KYC NOT DONE OR EXPIRED", **extra, "status": status.HTTP_403_FORBIDDEN},
+        status=status.HTTP_403_FORBIDDEN,
+    )
+
+
+def _kite_busy(e: KiteBusyException):
+    return JsonResponse(e.detail, status=e.status_code)
+
+
+async def check_status(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    user, error = await _authenticate(request)
+    if error:
+        return error
+
+    try:
+        kyc_done = await async_check_kyc_status(user)
+    except KiteBusyException as e:
+        return _kite_busy(e)
+    if not kyc_done:
+        return _kyc_failed()
+    return JsonResponse({"errors": None, "status": status.HTTP_200_OK})
+
+
+def _save_funds(zerodha_data, funds):
+    zerodha_data.funds = funds
+    zerodha_data.save()
+
+
+async def refresh_funds(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    user, error = await _authenticate(request)
+    if error:
+        return error
+
+    try:
+        kyc_done = await async_check_kyc_status(user)
+    except KiteBusyException as e:
+        return _kite_busy(e)
+    if not kyc_done:
+        return _kyc_failed(funds=None)
+
+    try:
+        zerodha_data: ZerodhaData = await sync_to_async(ZerodhaData.objects.get)(
+            local_user=user
+        )
+    except ZerodhaData.DoesNotExist:
+        return _kyc_failed(funds=None)
+
+    try:
+        resp = await kite.async_get_margins(zerodha_data.access_token)
+    except ratelimit.RateLimitExceeded:
+        return _kite_busy(KiteBusyException())
+    except httpx.HTTPError:
+        resp = None
+    if resp is None or resp.status_code != 200:
+        await sync_to_async(invalidate_kyc_status)(user.id)
+        return _kyc_failed(funds=None)
+
+    current_funds = resp.json()["data"]["equity"]["net"]
+    await sync_to_async(_save_funds)(zerodha_data, current_funds)
+    return JsonResponse(
+        {"errors": None, "funds": current_funds, "status": status.HTTP_200_OK}
+    )
+
+
+def _link_account(uuid, data, funds):
+    try:
+        user: User = User.objects.get(uuid=uuid)
+    except User.DoesNotExist:
+        return False
+
+    data["local_user_id"] = user.id
+    data["funds"] = funds
+    data["created_at"] = timezone.now()
+
+    with open("postbacks/data.json", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+
+    with transaction.atomic():
+        # Delete old data
+        ZerodhaData.objects.filter(local_user=user).delete()
+        ZerodhaData.objects.create(**data)
+    return True
+
+
+async def redirect(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    action = request.GET.get("action", None)
+    uuid = request.GET.get("uuid", None)
+    type = request.GET.get("type", None)
+    zerodha_status = request.GET.get("status", None)
+    request_token = request.GET.get("request_token", None)
+
+    failure = {
+        "result": "Failure",
+        "message": "Uh oh.. KYC linking failed, Please try again!",
+    }
+
+    if action == "basket":
+        context = {
+            "result": "Success",
+            "message": "Thank you! Your transaction has been completed successfully",
+        }
+        if zerodha_status == "cancelled":
+            context = {"result": "Cancelled", "message": "You cancelled your transaction"}
+        return render(request, "zerodha_redirect.html", context)
+
+    if not uuid or zerodha_status == "cancelled":
+        return render(request, "zerodha_redirect.html", failure)
+
+    if action and type and zerodha_status == "success" and request_token:
+        try:
+            data = await kite.async_generate_session(request_token)
+            if data is None:
+                return render(request, "zerodha_redirect.html", failure)
+            resp = await kite.async_get_margins(data["access_token"])
+        except (ratelimit.RateLimitExceeded, httpx.HTTPError) as e:
+            print(f"Kite login could not complete: {e}")
+            return render(request, "zerodha_redirect.html", failure)
+        if resp.status_code != 200:
+            return render(request, "zerodha_redirect.html", failure)
+        funds = resp.json()["data"]["equity"]["net"]
+
+        if await sync_to_async(_link_account)(uuid, data, funds):
+            return render(
+                request,
+                "zerodha_redirect.html",
+                {
+                    "result": "Success",
+                    "message": "Congratulations! Your trading account is successfully linked.",
+                    "linked": True,
+                },
+            )
+
+    return render(request, "zerodha_redirect.html", failure)
@@ -1,12 +1,23 @@
+from django.conf import settings
 from django.urls import path
 
+from api import zerodha_async_views
 from api.zerodha_views import CheckStatus, ExecuteTradeView, KYCView, PostBackView, Redirect, RefreshFundsView
 
+if settings.ZERODHA_ASYNC_VIEWS:
+    check_status_view = zerodha_async_views.check_status
+    redirect_view = zerodha_async_views.redirect
+    refresh_funds_view = zerodha_async_views.refresh_funds
+else:
+    check_status_view = CheckStatus.as_view()
+    redirect_view = Redirect.as_view()
+    refresh_funds_view = RefreshFundsView.as_view()
+
 urlpatterns = [
-    path("check-status/", CheckStatus.as_view(), name="check-status"),
+    path("check-status/", check_status_view, name="check-status"),
     path("get-kyc-url/", KYCView.as_view(), name="get-kyc-url"),
-    path("redirect/", Redirect.as_view(), name="redirect"),
+    path("redirect/", redirect_view, name="redirect"),
     path("execute-trade/<uuid:transaction_id>/",ExecuteTradeView.as_view(),name="execute-trade"),
     path("post-back/",PostBackView.as_view(),name="postback"),
-    path("refresh-funds/",RefreshFundsView.as_view(),name="refresh-funds")
+    path("refresh-funds/",refresh_funds_view,name="refresh-funds")
 ]
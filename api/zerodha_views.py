@@ -2,17 +2,14 @@ import json
 import urllib.parse
 
 import requests
-from adminpanel.models import AdminNotification
-from core.models import Notification, Transaction, User, UserSetting, ZerodhaData
-from core.utils import send_notification
+from core.models import Transaction, User, ZerodhaData
 from django.conf import settings
 from django.http import HttpResponseNotFound
 from django.shortcuts import render
 from django.views.generic import View
 from drf_spectacular.utils import extend_schema, inline_serializer
-from kiteconnect import KiteConnect
+from kiteconnect.exceptions import KiteException
 from rest_framework import serializers, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.renderers import TemplateHTMLRenderer
 from rest_framework.request import Request
@@ -20,10 +17,13 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
 
-from api.utils import check_kyc_status
+from api import kite, ratelimit
+from api.authentication import CachedTokenAuthentication
+from api.postbacks import enqueue_postback
+from api.tasks import process_postbacks
+from api.utils import KiteBusyException, check_kyc_status, invalidate_kyc_status
 
 KITE_CREDS = settings.KITE_CREDS
-kite = KiteConnect(api_key=KITE_CREDS["api_key"])
 
 
 class Redirect(APIView):
@@ -72,12 +72,25 @@ class Redirect(APIView):
 
         if action and type and zerodha_status and request_token:
             if zerodha_status == "success":
-                data = kite.generate_session(
-                    request_token, api_secret=KITE_CREDS["secret"]
-                )
-                kite.set_access_token(data["access_token"])
-
-                margins_data = kite.margins()
+                kite_connect = kite.get_kite_connect()
+                try:
+                    data = kite_connect.generate_session(
+                        request_token, api_secret=KITE_CREDS["secret"]
+                    )
+                    margins_data = kite_connect.margins()
+                except (
+                    ratelimit.RateLimitExceeded,
+                    requests.RequestException,
+                    KiteException,
+                ) as e:
+                    print(f"Kite login could not complete: {e}")
+                    result = "Failure"
+                    message = "Uh oh.. KYC linking failed, Please try again!"
+                    return render(
+                        request,
+                        "zerodha_redirect.html",
+                        {"result": result, "message": message},
+                    )
                 funds = margins_data["equity"]["net"]
 
                 try:
@@ -118,7 +131,7 @@ class Redirect(APIView):
 
 
 class KYCView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(
@@ -149,7 +162,7 @@ class KYCView(APIView):
 
 
 class CheckStatus(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(
@@ -226,7 +239,7 @@ class ExecuteTradeView(APIView):
 
 class RefreshFundsView(APIView):
     serializer_class = None
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(
@@ -241,7 +254,6 @@ class RefreshFundsView(APIView):
         ),
     )
     def get(self, request, *args, **kwargs):
-        api_key = KITE_CREDS["api_key"]
         kyc_done = check_kyc_status(user=request.user)
         
         if not kyc_done:
@@ -267,12 +279,14 @@ class RefreshFundsView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        headers = {
-            "X-Kite-Version": "3",
-            "Authorization": f"token {api_key}:{access_token}",
-        }
-        resp = requests.get("https://api.kite.trade/user/margins", headers=headers)
-        if resp.status_code != 200:
+        try:
+            resp = kite.get_margins(access_token)
+        except ratelimit.RateLimitExceeded:
+            raise KiteBusyException()
+        except requests.RequestException:
+            resp = None
+        if resp is None or resp.status_code != 200:
+            invalidate_kyc_status(request.user.id)
             return Response(
                 {
                     "errors": "KYC NOT DONE OR EXPIRED",
@@ -307,56 +321,9 @@ class PostBackView(APIView):
         tag = data.get("tag", None)
         if not tag:
             return Response(data={"msg": "No Tag"}, status=200)
-        tag = int(tag)
-        try:
-            transaction_obj: Transaction = Transaction.objects.get(id=tag)
-        except Transaction.DoesNotExist:
-            return Response(data={"msg": "No Transaction Obj"}, status=200)
-
-        if data.get("status", None) == "COMPLETE":
-            transaction_obj.price = data.get("average_price")
-            transaction_obj.quantity = data.get("quantity")
-            transaction_obj.amount = transaction_obj.price * transaction_obj.quantity
-            transaction_obj.verified = True
-            transaction_obj.status = "Completed"
-            transaction_obj.zerodha_postback = data
-
-            AdminNotification.objects.create(
-                notification_type="TRADE",
-                title=f"New trade!",
-                content=f"A new trade just took place, ID : ORD{transaction_obj.id}.",
-            )
-
-            user = transaction_obj.user
-            notification_type = (
-                "Purchase" if transaction_obj.transaction_type == "BUY" else "Sale"
-            )
-            head = f"{notification_type} Complete!"
-            body = f"Your {notification_type.lower()} order for {transaction_obj.trading_symbol} was completed successfully!"
-            Notification.objects.create(
-                user=user, notification_type=notification_type, head=head, body=body
-            )
-
-            try:
-                if not user.settings.notification_preference:
-                    transaction_obj.save()
-                    return Response(data={"msg": "Done"}, status=200) 
-                registration_id = user.settings.device_token
-            except UserSetting.DoesNotExist:
-                print("No Settings exist for user, aborting notification service.")
-
-            if registration_id:
-                send_notification(
-                    registration_id=registration_id,
-                    message_title=head,
-                    message_body=body,
-                )
-            else:
-                print("No device_token exist for user, aborting notification service.")
 
-        else:
-            transaction_obj.status = data.get("status", "Cancelled").title()
-            transaction_obj.zerodha_postback = data
-        transaction_obj.save()
+        # Acknowledge right away; api.tasks.process_postbacks applies it.
+        if enqueue_postback(data):
+            process_postbacks.delay()
 
         return Response(data={"msg": "Done"}, status=200)
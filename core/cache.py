@@ -0,0 +1,335 @@
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from types import MappingProxyType
+
+import redis
+from django.conf import settings
+from django.db import connection
+
+from core.models import MarketQuote
+
+QUOTE_CACHE_FIELDS = [
+    "company_name",
+    "trading_symbol",
+    "price",
+    "exchange",
+    "change",
+    "extra_text",
+]
+QUOTE_CACHE_VERSION_KEY = "quotes:version"
+# How long a superseded quote hash is kept around for in-flight readers.
+STALE_QUOTE_CACHE_TTL = 60 * 60
+SYMBOL_MAP_VERSION_KEY = "quotes:symbols:version"
+SYMBOL_MAP_CHECK_INTERVAL = settings.SYMBOL_MAP_CHECK_INTERVAL
+# Bumped on every quote write, see get_price_index.
+QUOTE_CHANGES_KEY = "quotes:changes"
+PRICE_INDEX_CHECK_INTERVAL = settings.PRICE_INDEX_CHECK_INTERVAL
+
+_redis = None
+
+
+def get_redis_connection():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+def _quote_cache_key(conn):
+    version = conn.get(QUOTE_CACHE_VERSION_KEY)
+    return f"quotes:v{int(version or 0)}"
+
+
+QuoteSymbol = namedtuple("QuoteSymbol", ["id", "instrument_token"])
+
+
+class SymbolMap:
+    """
+    Read-only snapshot of every MarketQuote for read-side symbol translation:
+    `quotes` maps (exchange, trading_symbol) to QuoteSymbol, `symbol_ids` maps
+    a bare trading_symbol to the ids of its rows on every exchange, and
+    `tokens` maps int instrument token to (exchange, trading_symbol).
+    It may be SYMBOL_MAP_CHECK_INTERVAL stale, so writes query the table.
+    """
+
+    def __init__(self, version, rows):
+        quotes = {}
+        symbol_ids = {}
+        tokens = {}
+        for id, exchange, symbol, token in rows:
+            quotes[(exchange, symbol)] = QuoteSymbol(id, token or None)
+            symbol_ids[symbol] = symbol_ids.get(symbol, ()) + (id,)
+            if token:
+                tokens[int(token)] = (exchange, symbol)
+        self.version = version
+        self.quotes = MappingProxyType(quotes)
+        self.symbol_ids = MappingProxyType(symbol_ids)
+        self.tokens = MappingProxyType(tokens)
+
+    def ids(self, symbols):
+        return [id for symbol in symbols for id in self.symbol_ids.get(symbol, ())]
+
+
+_symbol_map = None
+_symbol_map_checked_at = 0.0
+_symbol_map_lock = threading.Lock()
+
+
+def _symbol_map_version():
+    try:
+        return int(get_redis_connection().get(SYMBOL_MAP_VERSION_KEY) or 0)
+    except redis.RedisError as e:
+        print(f"Failed to read symbol map version: {e}")
+        return None
+
+
+def get_symbol_map():
+    """
+    The process-wide SymbolMap. Every SYMBOL_MAP_CHECK_INTERVAL seconds the
+    Redis version is compared and the map rebuilt with one query if another
+    process bumped it; snapshots are never mutated, only replaced.
+    """
+    global _symbol_map, _symbol_map_checked_at
+    symbol_map = _symbol_map
+    if (
+        symbol_map is not None
+        and time.monotonic() - _symbol_map_checked_at < SYMBOL_MAP_CHECK_INTERVAL
+    ):
+        return symbol_map
+
+    with _symbol_map_lock:
+        if _symbol_map is not symbol_map:
+            return _symbol_map
+        version = _symbol_map_version()
+        if symbol_map is None or (
+            version is not None and version != symbol_map.version
+        ):
+            symbol_map = SymbolMap(
+                version or 0,
+                MarketQuote.objects.values_list(
+                    "id", "exchange", "trading_symbol", "instrument_token"
+                ),
+            )
+            _symbol_map = symbol_map
+        _symbol_map_checked_at = time.monotonic()
+        return symbol_map
+
+
+def bump_symbol_map():
+    """Rebuild the symbol map here and, on their next check, in every other process."""
+    global _symbol_map
+    try:
+        get_redis_connection().incr(SYMBOL_MAP_VERSION_KEY)
+    except redis.RedisError as e:
+        print(f"Failed to bump symbol map version: {e}")
+    with _symbol_map_lock:
+        _symbol_map = None
+
+
+def _db_quotes(symbols=None):
+    query = MarketQuote.objects.all()
+    if symbols is not None:
+        query = query.filter(id__in=get_symbol_map().ids(symbols))
+    return {x["trading_symbol"]: x for x in query.values(*QUOTE_CACHE_FIELDS)}
+
+
+def cache_quotes(quotes):
+    """
+    Write {trading_symbol: quote_dict} into the current quote hash. The hash is
+    keyed by bare symbol like Holding: quotes are only created on NSE by the
+    stock-list upload, so a symbol never has two rows to collide.
+    """
+    if not quotes:
+        return
+    try:
+        conn = get_redis_connection()
+        pipe = conn.pipeline()
+        pipe.hset(
+            _quote_cache_key(conn),
+            mapping={symbol: json.dumps(quote) for symbol, quote in quotes.items()},
+        )
+        pipe.incr(QUOTE_CHANGES_KEY)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to write quote cache: {e}")
+
+
+def get_cached_quotes(symbols):
+    """
+    Read quotes for the given symbols with one HMGET, falling back to the
+    database for misses (and filling the cache with them).
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    try:
+        conn = get_redis_connection()
+        values = conn.hmget(_quote_cache_key(conn), symbols)
+    except redis.RedisError as e:
+        print(f"Failed to read quote cache: {e}")
+        return _db_quotes(symbols)
+
+    quotes = {
+        symbol: json.loads(value) for symbol, value in zip(symbols, values) if value
+    }
+    missing = [symbol for symbol in symbols if symbol not in quotes]
+    if missing:
+        missing_quotes = _db_quotes(missing)
+        cache_quotes(missing_quotes)
+        quotes.update(missing_quotes)
+    return quotes
+
+
+def get_all_cached_quotes():
+    """
+    Read every quote from the cache. The hash is only trusted once it has
+    been fully warmed from the database for the current version.
+    """
+    try:
+        conn = get_redis_connection()
+        key = _quote_cache_key(conn)
+        pipe = conn.pipeline()
+        pipe.exists(f"{key}:warm")
+        pipe.hgetall(key)
+        warm, values = pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to read quote cache: {e}")
+        return _db_quotes()
+
+    if not warm:
+        quotes = _db_quotes()
+        cache_quotes(quotes)
+        try:
+            conn.set(f"{key}:warm", 1)
+        except redis.RedisError:
+            pass
+        return quotes
+    return {symbol.decode(): json.loads(value) for symbol, value in values.items()}
+
+
+def invalidate_quote_cache():
+    """Move readers to a fresh, empty quote hash (e.g. after a stock-list upload)."""
+    try:
+        conn = get_redis_connection()
+        old_key = _quote_cache_key(conn)
+        pipe = conn.pipeline()
+        pipe.incr(QUOTE_CACHE_VERSION_KEY)
+        pipe.expire(old_key, STALE_QUOTE_CACHE_TTL)
+        pipe.delete(f"{old_key}:warm")
+        pipe.incr(QUOTE_CHANGES_KEY)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to invalidate quote cache: {e}")
+
+
+class PriceBandIndex:
+    """
+    Read-only snapshot of the cached quotes with a positive price, sorted by
+    price for bisect range lookups. Search fields are lowercased once here
+    instead of on every request.
+    """
+
+    def __init__(self, version, quotes):
+        quotes = sorted(
+            (x for x in quotes if x["price"] and x["price"] > 0),
+            key=lambda x: x["price"],
+        )
+        self.version = version
+        self.quotes = tuple(quotes)
+        self.prices = [x["price"] for x in quotes]
+        self.search = tuple(
+            ((x["company_name"] or "").lower(), x["trading_symbol"].lower())
+            for x in quotes
+        )
+        # Position of each quote in trading_symbol order, for sorting a band.
+        by_symbol = sorted(range(len(quotes)), key=lambda i: quotes[i]["trading_symbol"])
+        self.symbol_rank = [0] * len(quotes)
+        for rank, i in enumerate(by_symbol):
+            self.symbol_rank[i] = rank
+
+    def band(self, lower_price, upper_price, keyword=None):
+        """Quotes priced in [lower_price, upper_price] matching keyword, by trading_symbol."""
+        start = bisect_left(self.prices, lower_price)
+        end = bisect_right(self.prices, upper_price)
+        positions = range(start, end)
+        if keyword:
+            keyword = keyword.lower()
+            search = self.search
+            positions = [
+                i for i in positions if keyword in search[i][0] or keyword in search[i][1]
+            ]
+        return [
+            self.quotes[i] for i in sorted(positions, key=self.symbol_rank.__getitem__)
+        ]
+
+
+_price_index = None
+_price_index_checked_at = 0.0
+_price_index_refreshing = False
+_price_index_lock = threading.Lock()
+
+
+def _quote_changes():
+    try:
+        return int(get_redis_connection().get(QUOTE_CHANGES_KEY) or 0)
+    except redis.RedisError as e:
+        print(f"Failed to read quote changes: {e}")
+        return None
+
+
+def _refresh_price_index():
+    global _price_index, _price_index_checked_at, _price_index_refreshing
+    try:
+        version = _quote_changes()
+        price_index = _price_index
+        # Without Redis there is no version to compare, so rebuild on every
+        # check; get_all_cached_quotes falls back to the database.
+        if price_index is None or version is None or version != price_index.version:
+            _price_index = PriceBandIndex(version or 0, get_all_cached_quotes().values())
+    except Exception as e:
+        print(f"Failed to refresh price index: {e}")
+    finally:
+        _price_index_checked_at = time.monotonic()
+        _price_index_refreshing = False
+
+
+def _refresh_price_index_in_background():
+    try:
+        _refresh_price_index()
+    finally:
+        # The quote cache may have fallen back to the database.
+        connection.close()
+
+
+def get_price_index():
+    """
+    The process-wide PriceBandIndex. Only the first call in a process builds
+    it inline; after that, at most every PRICE_INDEX_CHECK_INTERVAL seconds a
+    background thread compares QUOTE_CHANGES_KEY and, if quotes changed,
+    rebuilds the index from get_all_cached_quotes() and swaps it in. Requests
+    keep reading the current snapshot meanwhile, and never touch Redis or
+    the database.
+    """
+    global _price_index, _price_index_checked_at, _price_index_refreshing
+    price_index = _price_index
+    if price_index is None:
+        with _price_index_lock:
+            if _price_index is None:
+                version = _quote_changes()
+                _price_index = PriceBandIndex(
+                    version or 0, get_all_cached_quotes().values()
+                )
+                _price_index_checked_at = time.monotonic()
+            return _price_index
+
+    if time.monotonic() - _price_index_checked_at >= PRICE_INDEX_CHECK_INTERVAL:
+        with _price_index_lock:
+            if not _price_index_refreshing:
+                _price_index_refreshing = True
+                threading.Thread(
+                    target=_refresh_price_index_in_background, daemon=True
+                ).start()
+    return price_index
@@ -0,0 +1,147 @@
+"""
+FIFO lot tracking.
+
+Every verified BUY opens a Lot. A verified SELL consumes the oldest open lots
+of the same user and symbol, and the realized P&L of the consumed quantity is
+stored on the SELL transaction, the consumed lots and the Holding. Holding
+therefore always carries the cost basis of what is still open, so portfolio
+reads never replay the trade history.
+"""
+from django.db.models import F
+
+from core.models import Holding, Lot, Transaction
+
+
+def consume_fifo(lots, quantity, price):
+    """
+    Consume quantity from the open lots (oldest first) at the given sell
+    price. Mutates the lots and returns (realized_pnl, cost_removed,
+    unmatched_quantity, touched_lots).
+    """
+    realized_pnl = 0.0
+    cost_removed = 0.0
+    touched = []
+    for lot in lots:
+        if quantity <= 0:
+            break
+        if lot.open_quantity <= 0:
+            continue
+        used = min(lot.open_quantity, quantity)
+        pnl = used * (price - lot.price)
+        lot.open_quantity -= used
+        lot.realized_pnl += pnl
+        realized_pnl += pnl
+        cost_removed += used * lot.price
+        quantity -= used
+        touched.append(lot)
+    return realized_pnl, cost_removed, quantity, touched
+
+
+def apply_fill(transaction_obj: Transaction):
+    """
+    Apply a newly verified transaction to the user's lots and Holding. Must
+    be called inside the atomic block that marks the transaction verified.
+    """
+    holding, _ = Holding.objects.get_or_create(
+        user_id=transaction_obj.user_id,
+        trading_symbol=transaction_obj.trading_symbol,
+        defaults={"exchange": transaction_obj.exchange},
+    )
+    # Serialize fills of the same user and symbol.
+    holding = Holding.objects.select_for_update().get(id=holding.id)
+
+    quantity = transaction_obj.quantity
+    price = transaction_obj.price or 0
+
+    if transaction_obj.transaction_type != "SELL":
+        Lot.objects.create(
+            transaction=transaction_obj,
+            user_id=transaction_obj.user_id,
+            trading_symbol=transaction_obj.trading_symbol,
+            quantity=quantity,
+            open_quantity=quantity,
+            price=price,
+            created_at=transaction_obj.created_at,
+        )
+        Holding.objects.filter(id=holding.id).update(
+            quantity=F("quantity") + quantity,
+            invested_amount=F("invested_amount") + quantity * price,
+        )
+        return
+
+    open_lots = list(
+        Lot.objects.select_for_update().filter(
+            user_id=transaction_obj.user_id,
+            trading_symbol=transaction_obj.trading_symbol,
+            open_quantity__gt=0,
+        )
+    )
+    realized_pnl, cost_removed, unmatched, touched = consume_fifo(
+        open_lots, quantity, price
+    )
+    # Quantity sold beyond the known lots has no cost basis to realize against.
+    cost_removed += unmatched * price
+
+    Lot.objects.bulk_update(touched, ["open_quantity", "realized_pnl"])
+    Transaction.objects.filter(id=transaction_obj.id).update(realized_pnl=realized_pnl)
+    transaction_obj.realized_pnl = realized_pnl
+    Holding.objects.filter(id=holding.id).update(
+        quantity=F("quantity") - quantity,
+        invested_amount=F("invested_amount") - cost_removed,
+        realized_pnl=F("realized_pnl") + realized_pnl,
+    )
+
+
+def replay_fills(transactions):
+    """
+    Rebuild lots and holdings in memory from verified transactions. Returns
+    (holdings, lots, sells) as unsaved Holding/Lot objects and the SELL
+    transactions with realized_pnl set.
+    """
+    holdings = {}
+    lots = {}
+    sells = []
+    for transaction_obj in transactions.filter(verified=True).order_by(
+        "user_id", "trading_symbol", "created_at", "id"
+    ):
+        key = (transaction_obj.user_id, transaction_obj.trading_symbol)
+        holding = holdings.get(key)
+        if holding is None:
+            holding = holdings[key] = Holding(
+                user_id=transaction_obj.user_id,
+                trading_symbol=transaction_obj.trading_symbol,
+                exchange=transaction_obj.exchange,
+            )
+        quantity = transaction_obj.quantity
+        price = transaction_obj.price or 0
+
+        if transaction_obj.transaction_type != "SELL":
+            lots.setdefault(key, []).append(
+                Lot(
+                    transaction_id=transaction_obj.id,
+                    user_id=transaction_obj.user_id,
+                    trading_symbol=transaction_obj.trading_symbol,
+                    quantity=quantity,
+                    open_quantity=quantity,
+                    price=price,
+                    created_at=transaction_obj.created_at,
+                )
+            )
+            holding.quantity += quantity
+            holding.invested_amount += quantity * price
+            continue
+
+        realized_pnl, cost_removed, unmatched, _ = consume_fifo(
+            lots.get(key, []), quantity, price
+        )
+        transaction_obj.realized_pnl = realized_pnl
+        sells.append(transaction_obj)
+        holding.quantity -= quantity
+        holding.invested_amount -= cost_removed + unmatched * price
+        holding.realized_pnl += realized_pnl
+
+    return (
+        list(holdings.values()),
+        [lot for key_lots in lots.values() for lot in key_lots],
+        sells,
+    )
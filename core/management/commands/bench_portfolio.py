@@ -0,0 +1,74 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from core.portfolio import value_holdings
+
+SYMBOLS = 2000
+HOLDINGS_PER_USER = 20
+
+
+def dict_loop_value(rows, prices):
+    """The per-entry dict loops the views and nightly task used before."""
+    portfolios = {}
+    for user_id, symbol, quantity, cost in rows:
+        entries = portfolios.setdefault(user_id, {})
+        if symbol in entries:
+            entries[symbol]["quantity"] += quantity
+            entries[symbol]["purchased_value"] += cost
+        else:
+            entries[symbol] = {"quantity": quantity, "purchased_value": cost}
+
+    totals = {}
+    for user_id, entries in portfolios.items():
+        for symbol, entry in entries.items():
+            entry["current_value"] = prices.get(symbol, 0) * entry["quantity"]
+        total = sum(x["current_value"] for x in entries.values())
+        for entry in entries.values():
+            entry["percentage"] = entry["current_value"] / total * 100 if total else 0
+        totals[user_id] = total
+    return totals
+
+
+class Command(BaseCommand):
+    help = "Compare the NumPy portfolio engine against the dict-loop implementation"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[10, 1000, 100000]
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        prices = {f"SYM{i}": random.uniform(1, 5000) for i in range(SYMBOLS)}
+        symbols = list(prices)
+
+        for size in options["sizes"]:
+            rows = [
+                (
+                    i // HOLDINGS_PER_USER,
+                    random.choice(symbols),
+                    random.randint(1, 100),
+                    random.uniform(100, 100000),
+                )
+                for i in range(size)
+            ]
+            legacy = min(
+                timeit.repeat(
+                    lambda: dict_loop_value(rows, prices),
+                    number=1,
+                    repeat=options["repeat"],
+                )
+            )
+            vectorized = min(
+                timeit.repeat(
+                    lambda: value_holdings(rows, prices)[1].owner_totals(),
+                    number=1,
+                    repeat=options["repeat"],
+                )
+            )
+            self.stdout.write(
+                f"{size:>7} holdings: dict loops {legacy * 1000:9.3f}ms, "
+                f"numpy {vectorized * 1000:9.3f}ms ({legacy / vectorized:.1f}x)"
+            )
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.lots import replay_fills
+from core.models import Holding, Lot, Transaction
+
+# Floating point amounts are compared with this tolerance in --verify mode.
+AMOUNT_TOLERANCE = 0.01
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild holdings and FIFO lots from verified transactions, "
+        "or verify them against the transactions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, default=None, help="Only this user id")
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Report mismatches without writing anything",
+        )
+
+    def handle(self, *args, **options):
+        transactions = Transaction.objects.all()
+        holdings = Holding.objects.all()
+        lots = Lot.objects.all()
+        if options["user"]:
+            transactions = transactions.filter(user_id=options["user"])
+            holdings = holdings.filter(user_id=options["user"])
+            lots = lots.filter(user_id=options["user"])
+
+        expected, expected_lots, sells = replay_fills(transactions)
+
+        if options["verify"]:
+            self.verify(expected, holdings)
+            return
+
+        with transaction.atomic():
+            holdings.delete()
+            lots.delete()
+            Holding.objects.bulk_create(expected, batch_size=1000)
+            Lot.objects.bulk_create(expected_lots, batch_size=1000)
+            Transaction.objects.bulk_update(sells, ["realized_pnl"], batch_size=1000)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {len(expected)} holdings and {len(expected_lots)} lots"
+            )
+        )
+
+    def verify(self, expected, holdings):
+        mismatches = 0
+        expected = {(x.user_id, x.trading_symbol): x for x in expected}
+        actual = {(x.user_id, x.trading_symbol): x for x in holdings}
+        for key in expected.keys() | actual.keys():
+            exp = expected.get(key, Holding())
+            act = actual.get(key, Holding())
+            if (
+                exp.quantity != act.quantity
+                or abs(exp.invested_amount - act.invested_amount) > AMOUNT_TOLERANCE
+                or abs(exp.realized_pnl - act.realized_pnl) > AMOUNT_TOLERANCE
+            ):
+                mismatches += 1
+                self.stdout.write(
+                    f"user={key[0]} symbol={key[1]}: expected "
+                    f"{exp.quantity} / {exp.invested_amount} / {exp.realized_pnl}, "
+                    f"found {act.quantity} / {act.invested_amount} / {act.realized_pnl}"
+                )
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"{mismatches} holdings out of sync"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(expected)} holdings in sync"))
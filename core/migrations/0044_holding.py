@@ -0,0 +1,31 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_rename_exchange_stock_company_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trading_symbol', models.CharField(max_length=20)),
+                ('exchange', models.CharField(default='', max_length=10)),
+                ('quantity', models.IntegerField(default=0)),
+                ('invested_amount', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holdings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='holding',
+            constraint=models.UniqueConstraint(fields=('user', 'trading_symbol'), name='unique_user_holding'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_holding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['-finished_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_jobreport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holding',
+            name='realized_pnl',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='realized_pnl',
+            field=models.FloatField(null=True),
+        ),
+        migrations.CreateModel(
+            name='Lot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trading_symbol', models.CharField(max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('open_quantity', models.IntegerField()),
+                ('price', models.FloatField()),
+                ('realized_pnl', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='lot', to='core.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='lot',
+            index=models.Index(condition=models.Q(('open_quantity__gt', 0)), fields=['user', 'trading_symbol', 'created_at'], name='open_lot_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_lot_transaction_realized_pnl'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostBack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=50)),
+                ('status', models.CharField(max_length=50)),
+                ('payload', models.JSONField()),
+                ('processed', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True, default='')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postback',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['id'], name='pending_postback_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='postback',
+            constraint=models.UniqueConstraint(fields=('order_id', 'status'), name='unique_postback'),
+        ),
+    ]
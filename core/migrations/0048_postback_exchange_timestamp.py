@@ -0,0 +1,26 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0047_postback'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='postback',
+            name='unique_postback',
+        ),
+        migrations.AddField(
+            model_name='postback',
+            name='exchange_timestamp',
+            field=models.CharField(blank=True, default='', max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='postback',
+            constraint=models.UniqueConstraint(fields=('order_id', 'status', 'exchange_timestamp'), name='unique_postback'),
+        ),
+    ]
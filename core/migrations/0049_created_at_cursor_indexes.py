@@ -0,0 +1,21 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0048_postback_exchange_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='notification_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='transaction_user_created_idx'),
+        ),
+    ]
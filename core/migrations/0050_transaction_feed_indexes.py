@@ -0,0 +1,31 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:51
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0049_created_at_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(django.db.models.expressions.F('user'), django.db.models.functions.datetime.TruncDate('created_at'), condition=models.Q(('verified', True)), name='transaction_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(django.db.models.expressions.F('user'), django.db.models.functions.datetime.TruncDate('created_at'), condition=models.Q(('transaction_type', 'BUY'), ('verified', True)), name='transaction_user_buy_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('verified', True)), fields=['-created_at'], name='transaction_verified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(django.db.models.functions.datetime.TruncDate('created_at'), django.db.models.expressions.OrderBy(django.db.models.expressions.F('created_at'), descending=True), condition=models.Q(('verified', True)), name='transaction_verified_date_idx'),
+        ),
+    ]
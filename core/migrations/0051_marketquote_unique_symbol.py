@@ -0,0 +1,34 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:52
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def delete_duplicate_quotes(apps, schema_editor):
+    """Keep the newest MarketQuote per (exchange, trading_symbol)."""
+    MarketQuote = apps.get_model("core", "MarketQuote")
+    duplicates = (
+        MarketQuote.objects.values("exchange", "trading_symbol")
+        .annotate(keep_id=Max("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        MarketQuote.objects.filter(
+            exchange=duplicate["exchange"],
+            trading_symbol=duplicate["trading_symbol"],
+        ).exclude(id=duplicate["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0050_transaction_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_quotes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='marketquote',
+            constraint=models.UniqueConstraint(fields=('exchange', 'trading_symbol'), name='unique_market_quote'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.5 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0051_marketquote_unique_symbol'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postback',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postback',
+            name='dead',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='postback',
+            name='retry_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
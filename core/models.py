@@ -8,6 +8,7 @@ from django.contrib.auth.models import (
 )
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.db.models.functions import TruncDate
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
 
@@ -195,6 +196,12 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="notification_user_created_idx",
+            )
+        ]
 
 
 class Transaction(models.Model):
@@ -220,14 +227,117 @@ class Transaction(models.Model):
     )  # Used to check if we executed this trade on our end or not! (One trade should only open one time.)
 
     zerodha_postback = models.JSONField(null=True)
+    realized_pnl = models.FloatField(null=True)  # Set on verified SELLs from FIFO lots.
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Kite order states only move forward: our initial "Pending", then any
+    # open/pending/update state, then a final one.
+    FINAL_STATUSES = ("Completed", "Cancelled", "Rejected")
+
     @property
     def purchased_value(self):
         return self.amount
 
+    @classmethod
+    def status_rank(cls, status):
+        if status in cls.FINAL_STATUSES:
+            return 2
+        return 0 if status == "Pending" else 1
+
+    def accepts_status(self, status, exchange_timestamp=None):
+        """Whether a postback may move this order to `status` without regressing it."""
+        current = self.status_rank(self.status)
+        new = self.status_rank(status)
+        if current == 2 or new != current:
+            return new > current
+        # Same stage (e.g. UPDATE after OPEN): only take newer exchange updates.
+        previous = (self.zerodha_postback or {}).get("exchange_timestamp") or ""
+        return (exchange_timestamp or "") >= previous
+
     class Meta:
         ordering = ["-created_at"]
+        # The date indexes match created_at__date lookups and TruncDate, which
+        # compile to (created_at AT TIME ZONE TIME_ZONE)::date.
+        indexes = [
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="transaction_user_created_idx",
+            ),
+            # Transaction feed and portfolio counts.
+            models.Index(
+                models.F("user"),
+                TruncDate("created_at"),
+                name="transaction_user_date_idx",
+                condition=models.Q(verified=True),
+            ),
+            # Journal.
+            models.Index(
+                models.F("user"),
+                TruncDate("created_at"),
+                name="transaction_user_buy_date_idx",
+                condition=models.Q(verified=True, transaction_type="BUY"),
+            ),
+            # Admin investing report.
+            models.Index(
+                fields=["-created_at"],
+                name="transaction_verified_idx",
+                condition=models.Q(verified=True),
+            ),
+            models.Index(
+                TruncDate("created_at"),
+                models.F("created_at").desc(),
+                name="transaction_verified_date_idx",
+                condition=models.Q(verified=True),
+            ),
+        ]
+
+
+class Holding(models.Model):
+    """
+    Net position per user and symbol, kept in step with verified transactions.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="holdings")
+    trading_symbol = models.CharField(max_length=20)
+    exchange = models.CharField(max_length=10, default="")
+    quantity = models.IntegerField(default=0)
+    invested_amount = models.FloatField(default=0)  # Cost of the open lots.
+    realized_pnl = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "trading_symbol"], name="unique_user_holding"
+            )
+        ]
+
+
+class Lot(models.Model):
+    """
+    Quantity bought by one verified BUY, consumed first-in first-out by SELLs.
+    """
+
+    transaction = models.OneToOneField(
+        Transaction, on_delete=models.CASCADE, related_name="lot"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="lots")
+    trading_symbol = models.CharField(max_length=20)
+    quantity = models.IntegerField()
+    open_quantity = models.IntegerField()
+    price = models.FloatField()
+    realized_pnl = models.FloatField(default=0)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(
+                fields=["user", "trading_symbol", "created_at"],
+                name="open_lot_idx",
+                condition=models.Q(open_quantity__gt=0),
+            )
+        ]
 
 
 class InvestmentInsight(models.Model):
@@ -239,6 +349,52 @@ class InvestmentInsight(models.Model):
         ordering = ["created_at"]
 
 
+class JobReport(models.Model):
+    name = models.CharField(max_length=100)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ["-finished_at"]
+
+    @property
+    def duration(self):
+        return (self.finished_at - self.started_at).total_seconds()
+
+
+class PostBack(models.Model):
+    """Raw Zerodha order postback, queued for api.tasks.process_postbacks."""
+
+    order_id = models.CharField(max_length=50)
+    status = models.CharField(max_length=50)
+    exchange_timestamp = models.CharField(max_length=30, default="", blank=True)
+    payload = models.JSONField()
+    processed = models.BooleanField(default=False)
+    error = models.TextField(default="", blank=True)
+    attempts = models.IntegerField(default=0)
+    retry_at = models.DateTimeField(null=True)  # Not picked up again before this.
+    dead = models.BooleanField(default=False)  # Gave up after POSTBACK_MAX_ATTEMPTS.
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order_id", "status", "exchange_timestamp"],
+                name="unique_postback",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed=False),
+                name="pending_postback_idx",
+            )
+        ]
+
+
 class Stock(models.Model):
     company_name = models.TextField()
     symbol = models.TextField()
@@ -255,6 +411,13 @@ class MarketQuote(models.Model):
     change = models.FloatField(null=True)
     extra_text = models.TextField(null=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["exchange", "trading_symbol"], name="unique_market_quote"
+            )
+        ]
+
 
 class EmailVerificationRecord(models.Model):
     uid = models.UUIDField(editable=False, default=uuid.uuid4, unique=True)
@@ -0,0 +1,110 @@
+"""
+Notification service. Callers collect in-app Notification rows and pushes in a
+NotificationBuffer; flush() writes the rows with one bulk_create and queues the
+pushes on core.tasks once the surrounding transaction commits, so no request
+waits on FCM. A message going to many devices is sent as FCM multicasts.
+"""
+import hashlib
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from core.cache import get_redis_connection
+from core.models import Notification
+from core.tasks import send_push, send_push_batch
+from core.utils import FCM_MULTICAST_LIMIT
+
+PUSH_DEDUPE_TTL = settings.PUSH_DEDUPE_TTL
+
+
+def _claim_pushes(pushes):
+    """
+    Drop pushes whose dedupe key already went to the device within
+    PUSH_DEDUPE_TTL; claims all of them in one Redis round trip. Pushes without
+    a dedupe key are always sent.
+    """
+    keyed = [push for push, (_, dedupe_key) in pushes.items() if dedupe_key]
+    unkeyed = [push for push, (_, dedupe_key) in pushes.items() if not dedupe_key]
+    if not keyed:
+        return unkeyed
+    try:
+        pipe = get_redis_connection().pipeline(transaction=False)
+        for push in keyed:
+            registration_id, dedupe_key = push[0], pushes[push][1]
+            digest = hashlib.sha1(
+                f"{registration_id}\n{dedupe_key}".encode("utf-8")
+            ).hexdigest()
+            pipe.set(f"push:{digest}", 1, nx=True, ex=PUSH_DEDUPE_TTL)
+        claimed = pipe.execute()
+    except redis.RedisError as e:
+        print(f"Push dedupe unavailable, sending anyway: {e}")
+        return list(pushes)
+    return unkeyed + [push for push, ok in zip(keyed, claimed) if ok]
+
+
+class NotificationBuffer:
+    def __init__(self):
+        self.notifications = []
+        self.pushes = {}
+
+    def add(self, notification: Notification, registration_id=None, dedupe_key=None):
+        """Queue an unsaved Notification row, and its push if the user has a device."""
+        self.notifications.append(notification)
+        if registration_id:
+            self.push(
+                registration_id, notification.head, notification.body, dedupe_key=dedupe_key
+            )
+
+    def push(
+        self,
+        registration_id,
+        message_title,
+        message_body,
+        notification_type="Normal",
+        dedupe_key=None,
+    ):
+        """
+        Queue a push. dedupe_key names the event it announces (e.g. an order
+        fill), so a redelivered event doesn't notify the device twice while a
+        different event with the same text still goes out.
+        """
+        # Repeats of the same message to a device within a buffer collapse.
+        self.pushes[(registration_id, message_title, message_body)] = (
+            notification_type,
+            dedupe_key,
+        )
+
+    def flush(self):
+        notifications, pushes = self.notifications, self.pushes
+        self.notifications, self.pushes = [], {}
+
+        Notification.objects.bulk_create(notifications)
+
+        def enqueue():
+            messages = defaultdict(list)
+            for registration_id, title, body in _claim_pushes(pushes):
+                notification_type, _ = pushes[(registration_id, title, body)]
+                messages[(title, body, notification_type)].append(registration_id)
+            for (title, body, notification_type), registration_ids in messages.items():
+                if len(registration_ids) == 1:
+                    send_push.delay(registration_ids[0], title, body, notification_type)
+                    continue
+                for i in range(0, len(registration_ids), FCM_MULTICAST_LIMIT):
+                    send_push_batch.delay(
+                        registration_ids[i : i + FCM_MULTICAST_LIMIT],
+                        title,
+                        body,
+                        notification_type,
+                    )
+
+        transaction.on_commit(enqueue)
+        return len(notifications), len(pushes)
+
+
+def notify(notification: Notification, registration_id=None, dedupe_key=None):
+    """Save one Notification and queue its push."""
+    buffer = NotificationBuffer()
+    buffer.add(notification, registration_id, dedupe_key)
+    buffer.flush()
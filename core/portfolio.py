@@ -0,0 +1,79 @@
+"""
+Vectorized portfolio valuation.
+
+Holdings are kept as parallel NumPy arrays (owner index, symbol index,
+signed quantity, cost) and valued against a price vector in one pass, for
+one user or for many users at once.
+"""
+import numpy as np
+
+
+class PriceVector:
+    """Prices addressed through a symbol -> index map. Unknown symbols price at 0."""
+
+    def __init__(self, prices):
+        self.index = {symbol: i for i, symbol in enumerate(prices)}
+        # The trailing slot is the zero price used for unknown symbols.
+        self.prices = np.append(
+            np.fromiter(prices.values(), dtype=float, count=len(prices)), 0.0
+        )
+        self.missing = len(prices)
+
+    def indices(self, symbols):
+        return np.fromiter(
+            (self.index.get(symbol, self.missing) for symbol in symbols),
+            dtype=np.int64,
+            count=len(symbols),
+        )
+
+
+class Holdings:
+    def __init__(self, owners, symbols, quantities, costs, price_vector):
+        self.owner_ids, self.owner_index = np.unique(
+            np.asarray(owners, dtype=np.int64), return_inverse=True
+        )
+        self.symbol_index = price_vector.indices(symbols)
+        self.quantity = np.asarray(quantities, dtype=float)
+        self.cost = np.asarray(costs, dtype=float)
+
+    @classmethod
+    def from_rows(cls, rows, price_vector):
+        """rows: iterable of (owner_id, symbol, quantity, cost)."""
+        rows = list(rows)
+        if not rows:
+            return cls([], [], [], [], price_vector)
+        owners, symbols, quantities, costs = zip(*rows)
+        return cls(owners, symbols, quantities, costs, price_vector)
+
+    def __len__(self):
+        return len(self.quantity)
+
+
+class Valuation:
+    def __init__(self, holdings, price_vector):
+        n_owners = len(holdings.owner_ids)
+        self.owner_ids = holdings.owner_ids
+        self.current_value = holdings.quantity * price_vector.prices[holdings.symbol_index]
+        self.pnl = self.current_value - holdings.cost
+        self.owner_value = np.bincount(
+            holdings.owner_index, weights=self.current_value, minlength=n_owners
+        )
+        self.owner_cost = np.bincount(
+            holdings.owner_index, weights=holdings.cost, minlength=n_owners
+        )
+        owner_value = self.owner_value[holdings.owner_index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.percentage = np.where(
+                owner_value != 0, self.current_value / owner_value * 100, 0.0
+            )
+
+    def owner_totals(self):
+        """{owner_id: total current value}"""
+        return dict(zip(self.owner_ids.tolist(), self.owner_value.tolist()))
+
+
+def value_holdings(rows, prices):
+    """Value (owner_id, symbol, quantity, cost) rows against {symbol: price}."""
+    price_vector = PriceVector(prices)
+    holdings = Holdings.from_rows(rows, price_vector)
+    return holdings, Valuation(holdings, price_vector)
@@ -0,0 +1,62 @@
+import requests
+from api.authentication import invalidate_auth_cache
+from celery import shared_task
+from django.conf import settings
+from pyfcm.errors import FCMServerError
+
+from core.models import UserSetting
+from core.utils import (
+    invalid_registration_ids,
+    send_multicast_notification,
+    send_notification,
+)
+
+PUSH_MAX_RETRIES = settings.PUSH_MAX_RETRIES
+
+
+def prune_device_tokens(registration_ids):
+    """Clear device tokens FCM rejected. Returns how many settings rows changed."""
+    settings_rows = UserSetting.objects.filter(device_token__in=registration_ids)
+    user_ids = list(settings_rows.values_list("user_id", flat=True))
+    if not user_ids:
+        return 0
+    pruned = settings_rows.update(device_token="")
+    # Settings are cached with the user's auth token.
+    invalidate_auth_cache(*user_ids)
+    return pruned
+
+
+@shared_task(
+    autoretry_for=(FCMServerError, requests.RequestException),
+    retry_backoff=True,
+    retry_backoff_max=10 * 60,
+    retry_jitter=True,
+    max_retries=PUSH_MAX_RETRIES,
+)
+def send_push(registration_id, message_title, message_body, notification_type="Normal"):
+    """Deliver one push, retried with exponential backoff while FCM is unavailable."""
+    response = send_notification(
+        registration_id=registration_id,
+        message_title=message_title,
+        message_body=message_body,
+        notification_type=notification_type,
+    )
+    if invalid_registration_ids([registration_id], response):
+        prune_device_tokens([registration_id])
+
+
+@shared_task(
+    autoretry_for=(FCMServerError, requests.RequestException),
+    retry_backoff=True,
+    retry_backoff_max=10 * 60,
+    retry_jitter=True,
+    max_retries=PUSH_MAX_RETRIES,
+)
+def send_push_batch(registration_ids, message_title, message_body, notification_type="Normal"):
+    """send_push for one message to up to FCM_MULTICAST_LIMIT devices."""
+    response = send_multicast_notification(
+        registration_ids, message_title, message_body, notification_type
+    )
+    invalid = invalid_registration_ids(registration_ids, response)
+    if invalid:
+        prune_device_tokens(invalid)
@@ -1,3 +1,108 @@
+import datetime
+import unittest
+
+from django.db import connection
+from django.db.models.functions import TruncDate
 from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Transaction, User
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "EXPLAIN checks need Postgres")
+class TransactionQueryPlanTests(TestCase):
+    """
+    Each hot Transaction queryset must be planned on the index added for it.
+    The table is seeded and analyzed so the planner sees realistic row counts
+    and picks the selective index over the user FK index or a table scan.
+    """
+
+    from_date = datetime.date(2022, 3, 1)
+    to_date = datetime.date(2022, 3, 31)
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(email=f"plan{i}@example.com", firebase_token=f"plan{i}")
+            for i in range(200)
+        )
+        cls.user = users[0]
+
+        start = timezone.make_aware(datetime.datetime(2022, 1, 1))
+        Transaction.objects.bulk_create(
+            (
+                Transaction(
+                    user=users[i % len(users)],
+                    trading_symbol="INFY",
+                    exchange="NSE",
+                    quantity=1,
+                    price=100,
+                    amount=100,
+                    transaction_type="BUY" if i % 3 else "SELL",
+                    verified=i % 4 != 0,
+                )
+                for i in range(50000)
+            ),
+            batch_size=5000,
+        )
+        # created_at is auto_now_add, so spread the rows over a year afterwards.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE core_transaction SET created_at = %s + (id %% 365) * interval '1 day'",
+                [start],
+            )
+            cursor.execute("ANALYZE core_transaction")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_transaction_feed_dates(self):
+        dates = (
+            self.user.transactions.filter(verified=True)
+            .annotate(date=TruncDate("created_at"))
+            .values("date")
+            .order_by("-date")
+            .distinct()
+        )
+        self.assertUsesIndex(dates[:30], "transaction_user_date_idx")
+        self.assertUsesIndex(
+            dates.filter(date__lt=self.to_date)[:30], "transaction_user_date_idx"
+        )
+
+    def test_transaction_feed_rows(self):
+        self.assertUsesIndex(
+            self.user.transactions.filter(
+                verified=True,
+                created_at__date__range=(self.from_date, self.to_date),
+            ).order_by("-created_at", "-id"),
+            "transaction_user_date_idx",
+        )
+
+    def test_journal(self):
+        self.assertUsesIndex(
+            self.user.transactions.filter(
+                verified=True,
+                transaction_type="BUY",
+                created_at__date__range=(self.from_date, self.to_date),
+            )
+            .values("amount", "lot__open_quantity")
+            .order_by("-created_at", "-id"),
+            "transaction_user_buy_date_idx",
+        )
+
+    def test_latest_transaction(self):
+        self.assertUsesIndex(
+            self.user.transactions.all()[:1], "transaction_user_created_idx"
+        )
 
-# Create your tests here.
+    def test_investing_report(self):
+        report = Transaction.objects.filter(verified=True)
+        self.assertUsesIndex(report[:15], "transaction_verified_idx")
+        self.assertUsesIndex(
+            report.filter(
+                created_at__date__gte=self.from_date,
+                created_at__date__lte=self.to_date,
+            )[:15],
+            "transaction_verified_date_idx",
+        )
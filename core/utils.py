@@ -1,8 +1,116 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from pyfcm import FCMNotification
 
+from core.cache import QUOTE_CACHE_FIELDS, bump_symbol_map, cache_quotes
+from core.models import MarketQuote
+
 FCM_SERVER_KEY = settings.FCM_SERVER_KEY
+# Registration ids per FCM (legacy HTTP API) multicast request.
+FCM_MULTICAST_LIMIT = 1000
+# Per-device errors meaning the token will never work again.
+FCM_INVALID_TOKEN_ERRORS = ("NotRegistered", "InvalidRegistration")
+
 push_service = FCMNotification(api_key=FCM_SERVER_KEY)
 
 def send_notification(registration_id,message_title,message_body,notification_type="Normal"):
-    push_service.notify_single_device(registration_id,message_title,message_body,data_message={"type":notification_type})
+    return push_service.notify_single_device(registration_id,message_title,message_body,data_message={"type":notification_type})
+
+
+def send_multicast_notification(registration_ids, message_title, message_body, notification_type="Normal"):
+    """
+    One push to up to FCM_MULTICAST_LIMIT devices. Returns the FCM response
+    dict; its "results" line up with registration_ids.
+    """
+    return push_service.notify_multiple_devices(registration_ids,message_title,message_body,data_message={"type":notification_type})
+
+
+def invalid_registration_ids(registration_ids, response):
+    return [
+        registration_id
+        for registration_id, result in zip(registration_ids, response["results"])
+        if result.get("error") in FCM_INVALID_TOKEN_ERRORS
+    ]
+
+
+def upsert_market_quotes(quote_data, create_data=None):
+    """
+    Apply {(exchange, trading_symbol): {field: value}} to MarketQuote in bulk
+    and refresh the quote cache for the rows that changed.
+
+    The affected quotes are loaded with one query on the (exchange,
+    trading_symbol) unique index, only rows whose values changed are written
+    (with a single bulk_update), and unknown quotes are created from
+    create_data[(exchange, trading_symbol)] when create_data is given.
+    Returns (updated_count, created_count).
+    """
+    if not quote_data:
+        return 0, 0
+    fields = {field for values in quote_data.values() for field in values}
+    symbols_by_exchange = defaultdict(list)
+    for exchange, symbol in quote_data:
+        symbols_by_exchange[exchange].append(symbol)
+    existing = {
+        (quote.exchange, quote.trading_symbol): quote
+        for quote in MarketQuote.objects.filter(
+            reduce(
+                or_,
+                (
+                    Q(exchange=exchange, trading_symbol__in=symbols)
+                    for exchange, symbols in symbols_by_exchange.items()
+                ),
+            )
+        ).only("id", *QUOTE_CACHE_FIELDS, *fields)
+    }
+
+    to_update = []
+    to_create = []
+    changed_fields = set()
+    for key, values in quote_data.items():
+        quote = existing.get(key)
+        if quote is None:
+            exchange, symbol = key
+            if create_data is None:
+                print(f"Failed to update MarketQuote for {exchange}:{symbol}")
+            else:
+                to_create.append(
+                    MarketQuote(
+                        exchange=exchange,
+                        trading_symbol=symbol,
+                        **create_data[key],
+                        **values,
+                    )
+                )
+            continue
+
+        changed = [field for field, value in values.items() if getattr(quote, field) != value]
+        if changed:
+            for field in changed:
+                setattr(quote, field, values[field])
+            changed_fields.update(changed)
+            to_update.append(quote)
+
+    with transaction.atomic():
+        if to_update:
+            MarketQuote.objects.bulk_update(to_update, changed_fields, batch_size=500)
+        if to_create:
+            MarketQuote.objects.bulk_create(to_create, batch_size=500)
+
+    if to_create or "instrument_token" in changed_fields:
+        bump_symbol_map()
+
+    cache_quotes(
+        {
+            quote.trading_symbol: {
+                field: getattr(quote, field) for field in QUOTE_CACHE_FIELDS
+            }
+            for quote in to_update + to_create
+        }
+    )
+
+    return len(to_update), len(to_create)
@@ -5,7 +5,7 @@ from celery.schedules import crontab
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'invest.settings')
 
-app = Celery('invest',include=["api.tasks"])
+app = Celery('invest',include=["api.tasks", "adminpanel.tasks", "core.tasks"])
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.conf.beat_schedule = {
@@ -21,6 +21,10 @@ app.conf.beat_schedule = {
         "task": "api.tasks.deactivate_subscriptions",
          "schedule": crontab(hour=2, minute=0),
     },
+    "process_postbacks": {
+        "task": "api.tasks.process_postbacks",
+         "schedule": crontab(minute="*/1"),
+    },
     "temp": {
         "task": "api.tasks.temp",
          "schedule":crontab(minute="*/1"),
@@ -159,7 +159,7 @@ AUTH_USER_MODEL = "core.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -191,6 +191,78 @@ SECURE_BROWSER_XSS_FILTER = True
 
 SUBSCRIPTION_AMOUNT = 69
 
+# Shared Kite HTTP client (api/kite.py).
+KITE_API_ROOT = "https://api.kite.trade"
+KITE_POOL_SIZE = 10
+KITE_ASYNC_POOL_SIZE = 100
+KITE_REQUEST_RETRIES = 3
+KITE_REQUEST_TIMEOUT = 10
+# Client side rate limits (requests/second, shared by all processes through
+# Redis) per Kite endpoint class, and how long a call may queue for its slot
+# before it is shed.
+KITE_RATE_LIMITS = {
+    "quote": 1,
+    "historical": 3,
+    "orders": 10,
+    "default": 10,
+}
+KITE_RATE_LIMIT_MAX_WAIT = 5
+
+# Serve CheckStatus, RefreshFunds and Redirect from the async views in
+# api/zerodha_async_views.py. Only worth enabling under ASGI (invest.asgi).
+ZERODHA_ASYNC_VIEWS = False
+
+# Kite allows at most 500 instruments per /quote call.
+KITE_QUOTE_BATCH_SIZE = 500
+KITE_QUOTE_WORKERS = 4
+# A successful KYC/token check is trusted for this long, never past the
+# daily Kite session expiry (KITE_SESSION_EXPIRY_HOUR, local time).
+KYC_CACHE_TTL = 15 * 60
+KITE_SESSION_EXPIRY_HOUR = 6
+# Single-flight access token refresh: lock lifetime, how long concurrent
+# callers wait on it, and how long the last outcome is reused.
+KITE_REFRESH_LOCK_TIMEOUT = 30
+KITE_REFRESH_LOCK_WAIT = 20
+KITE_REFRESH_RESULT_TTL = 30
+
+# Tick stream ingestion (manage.py stream_quotes). None means the live Kite ticker.
+KITE_TICKER_ROOT = None
+QUOTE_STREAM_FLUSH_INTERVAL = 1
+# Flush intervals the ticker may stay disconnected before the streamer
+# re-checks the access token and rebuilds it.
+QUOTE_STREAM_MAX_DOWN_INTERVALS = 30
+
+# How often (seconds) a process checks whether its in-process MarketQuote
+# symbol map is stale (see core.cache.get_symbol_map).
+SYMBOL_MAP_CHECK_INTERVAL = 5
+# Same for the in-process price-band index behind the market filter
+# (core.cache.get_price_index); quote updates bump its version.
+PRICE_INDEX_CHECK_INTERVAL = 1
+
+# Users per calculate_portfolio_value shard (one Celery task each).
+PORTFOLIO_SHARD_SIZE = 5000
+
+# Zerodha postbacks applied per transaction by api.tasks.process_postbacks.
+POSTBACK_BATCH_SIZE = 100
+# How long a postback (order_id, status, exchange timestamp) is remembered
+# in Redis to drop replays.
+POSTBACK_DEDUPE_TTL = 2 * 24 * 60 * 60
+# A postback that fails to apply is retried after POSTBACK_RETRY_DELAY
+# seconds, doubling each time, and marked dead after POSTBACK_MAX_ATTEMPTS.
+POSTBACK_MAX_ATTEMPTS = 5
+POSTBACK_RETRY_DELAY = 60
+
+# Token -> user cache (api.authentication): Redis and in-process lifetimes,
+# and how many tokens each process keeps.
+AUTH_CACHE_TTL = 5 * 60
+AUTH_CACHE_LOCAL_TTL = 5
+AUTH_CACHE_LOCAL_SIZE = 1024
+
+# Push delivery (core.tasks.send_push): retries with exponential backoff, and
+# how long a push with the same dedupe key to the same device is suppressed.
+PUSH_MAX_RETRIES = 5
+PUSH_DEDUPE_TTL = 60
+
 if os.name == 'nt':
     HOST = "127.0.0.1:8000"
 else:
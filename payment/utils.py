@@ -11,7 +11,8 @@ from core.models import (
     UserSubscription,
     UserSubscriptionHistory,
 )
-from core.utils import send_notification
+from api.authentication import invalidate_auth_cache
+from core.notifications import notify
 from django.conf import settings
 from django.utils import timezone
 
@@ -65,6 +66,7 @@ def handle_subscription_update(user: User, amount: float, order_id):
 
     subscription.active = True
     subscription.save()
+    invalidate_auth_cache(user.id)
 
     history_obj = UserSubscriptionHistory.objects.create(
         subscription=subscription, amount=amount, transaction_id=str(order_id), payment_gateway="PayU"
@@ -74,6 +76,7 @@ def handle_subscription_update(user: User, amount: float, order_id):
         title=f"Subscription Purchased!",
         content=f"User - CU{user.id}, has just purchased a subscription!",
     )
+    registration_id = None
     try:
         registration_id = user.settings.device_token
     except UserSetting.DoesNotExist:
@@ -81,15 +84,13 @@ def handle_subscription_update(user: User, amount: float, order_id):
 
     head = f"Subscription Purchased!"
     body = f"Your subscription renewal is successful."
-    Notification.objects.create(
-        user=user, notification_type="Subscription", head=head, body=body
-    )
-    if registration_id:
-        send_notification(
-            registration_id=registration_id, message_title=head, message_body=body
-        )
-    else:
+    if not registration_id:
         print("No device_token exist for user, aborting notification service.")
+    notify(
+        Notification(user=user, notification_type="Subscription", head=head, body=body),
+        registration_id,
+        dedupe_key=f"subscription:{order_id}",
+    )
 
 
 def confirm_and_update_order(order_id: str):
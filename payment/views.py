@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.shortcuts import render
 
+from api.authentication import CachedTokenAuthentication
 from payment.models import PayUOrder
 from payment.utils import confirm_and_update_order, create_order, get_payment_context
 
@@ -15,7 +16,6 @@ from drf_spectacular.utils import (
     inline_serializer,
 )
 from rest_framework import mixins, serializers, status, viewsets
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
@@ -24,7 +24,7 @@ from rest_framework.views import APIView
 
 
 class SubscribeView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(